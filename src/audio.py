@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import threading
+import time
+import wave
+from collections import deque
+
+import numpy as np
+
+# sounddevice gives us one persistent, callback driven output stream; it is only needed
+# for DeviceSink, the null and file sinks work without a sound card
+try:
+    import sounddevice as sd
+except ImportError:
+    sd = None
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+
+def load_wave(path, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    '''
+    Decode a 16 bit WAV file into an int16 array of shape (frames, channels), converted to
+    the engine's channel count and (by linear interpolation) sample rate.
+    '''
+    with wave.open(path, 'rb') as w:
+        if w.getsampwidth() != 2:
+            raise ValueError('{}: only 16 bit WAV files are supported'.format(path))
+        data = np.frombuffer(w.readframes(w.getnframes()), np.int16).reshape(-1, w.getnchannels())
+        rate = w.getframerate()
+    return conform(data, rate, sample_rate, channels)
+
+
+def conform(data, rate, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    '''
+    Convert int16 (frames, channels) PCM to the engine's channel count and sample rate.
+    Already conforming data is returned as is (no copy).
+    '''
+    if data.shape[1] != channels:
+        # mono -> stereo by duplication, anything else by averaging down to mono first
+        mono = data.mean(axis=1, keepdims=True) if data.shape[1] > 1 else data
+        data = np.repeat(mono, channels, axis=1).astype(np.int16)
+    if rate != sample_rate:
+        frames = int(round(len(data) * sample_rate / float(rate)))
+        src = np.arange(len(data))
+        dst = np.linspace(0, len(data) - 1, frames)
+        data = np.stack([np.interp(dst, src, data[:, c]) for c in range(channels)], axis=1).astype(np.int16)
+    return data
+
+
+class Voice(object):
+    '''
+    One playing sample.
+    '''
+    __slots__ = ('data', 'pos', 'gain', 'started')
+
+    def __init__(self, data, gain, started):
+        self.data = data
+        self.pos = 0
+        self.gain = gain
+        self.started = started
+
+
+class AudioEngine(object):
+    '''
+    Mixes every playing sample into one output stream, block by block.
+
+    Samples are int16 (frames, channels) buffers, the views a samplebank.SampleLibrary hands
+    out. trigger() only queues a voice, the sink's audio thread picks it up at the start of
+    the next block, so a hit costs the vision loop almost nothing and reaches the output
+    within one block (block_size / sample_rate seconds). At most polyphony voices play at
+    once; a new voice beyond that steals the oldest one.
+
+    The sink decides where the blocks go: DeviceSink (a sound card, needs sounddevice),
+    NullSink (discarded, for benchmarks) or WaveFileSink (a WAV file, for tests). render()
+    can also be called directly to pull blocks without any sink.
+    '''
+
+    def __init__(self, sink=None, polyphony=16, block_size=256, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+        self.sink = sink
+        self.polyphony = polyphony
+        self.block_size = block_size
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+        # triggers from the vision loop, drained by the audio thread
+        self.pending = deque()
+        # voices owned by the audio thread
+        self.voices = []
+
+        # counters, and how long the last voice waited between trigger() and its first block
+        self.triggered = 0
+        self.stolen = 0
+        self.blocks = 0
+        self.latency = 0.0
+        # recent frame to sound latencies (seconds from the origin given to trigger() to the
+        # voice's first block) of the triggers that did not bring their own deque, appended by
+        # the audio thread
+        self.sound_latencies = deque(maxlen=1000)
+        # perf_counter time of the first block that had a voice in it (None = silent so far)
+        self.first_sound = None
+
+    def trigger(self, data, gain=1.0, origin=None, latencies=None):
+        '''
+        Start playing a sample buffer at the next block. Safe to call from any thread.
+        origin is the perf_counter time of whatever caused the hit (the camera frame), for the
+        frame to sound latency; it is appended to latencies (a deque, the triggering pad's) or
+        else to sound_latencies.
+        '''
+        self.pending.append((data, gain, time.perf_counter(), origin, latencies))
+
+    def render(self, frames=None):
+        '''
+        Mix the next block of frames (block_size by default) of every playing voice and return
+        it as float32 (frames, channels) in [-1, 1].
+        '''
+        frames = frames or self.block_size
+        voices = self.voices
+
+        # start the queued voices, stealing the oldest ones above the polyphony limit
+        while self.pending:
+            data, gain, started, origin, latencies = self.pending.popleft()
+            if len(voices) >= self.polyphony:
+                voices.pop(0)
+                self.stolen += 1
+            voices.append(Voice(data, gain, started))
+            self.triggered += 1
+            now = time.perf_counter()
+            self.latency = now - started
+            if self.first_sound is None:
+                self.first_sound = now
+            if origin is not None:
+                (self.sound_latencies if latencies is None else latencies).append(now - origin)
+
+        out = np.zeros((frames, self.channels), np.float32)
+        finished = False
+        for voice in voices:
+            chunk = voice.data[voice.pos:voice.pos + frames]
+            out[:len(chunk)] += chunk * np.float32(voice.gain / 32768.)
+            voice.pos += frames
+            finished = finished or voice.pos >= len(voice.data)
+        if finished:
+            self.voices = [voice for voice in voices if voice.pos < len(voice.data)]
+
+        self.blocks += 1
+        np.clip(out, -1, 1, out=out)
+        return out
+
+    def start(self):
+        '''
+        Start pulling blocks into the sink.
+        '''
+        if self.sink is not None:
+            self.sink.start(self)
+        return self
+
+    def stop(self):
+        if self.sink is not None:
+            self.sink.stop()
+
+    def stats(self):
+        return {'triggered': self.triggered, 'stolen': self.stolen, 'playing': len(self.voices), 'blocks': self.blocks,
+                'latency_ms': round(self.latency * 1000, 2)}
+
+
+class DeviceSink(object):
+    '''
+    Plays the mix on a sound card through one persistent sounddevice output stream.
+    '''
+
+    def __init__(self, device=None):
+        if sd is None:
+            raise ImportError('DeviceSink needs the sounddevice package (pip install sounddevice), '
+                              'or run with --audio null / --mute')
+        self.device = device
+        self.stream = None
+
+    def start(self, engine):
+        def callback(outdata, frames, time_info, status):
+            outdata[:] = engine.render(frames)
+        self.stream = sd.OutputStream(samplerate=engine.sample_rate, blocksize=engine.block_size,
+                                      channels=engine.channels, dtype='float32', latency='low',
+                                      device=self.device, callback=callback)
+        self.stream.start()
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+
+
+class NullSink(object):
+    '''
+    Pulls blocks on its own thread at the pace a sound card would (or as fast as possible when
+    realtime is False) and hands them to write(), which throws them away. Subclasses keep them.
+    '''
+
+    def __init__(self, realtime=True):
+        self.realtime = realtime
+        self.running = False
+        self.thread = None
+
+    def start(self, engine):
+        self.running = True
+        self.thread = threading.Thread(target=self._pull, args=(engine,), name='audio-sink', daemon=True)
+        self.thread.start()
+
+    def _pull(self, engine):
+        period = engine.block_size / float(engine.sample_rate)
+        deadline = time.perf_counter()
+        while self.running:
+            self.write(engine.render())
+            if self.realtime:
+                deadline += period
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def write(self, block):
+        pass
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.close()
+
+    def close(self):
+        pass
+
+
+class WaveFileSink(NullSink):
+    '''
+    Writes the mix to a 16 bit WAV file.
+    '''
+
+    def __init__(self, path, realtime=True):
+        NullSink.__init__(self, realtime)
+        self.path = path
+        self.out = None
+
+    def start(self, engine):
+        self.out = wave.open(self.path, 'wb')
+        self.out.setnchannels(engine.channels)
+        self.out.setsampwidth(2)
+        self.out.setframerate(engine.sample_rate)
+        NullSink.start(self, engine)
+
+    def write(self, block):
+        self.out.writeframes((block * 32767).astype(np.int16).tobytes())
+
+    def close(self):
+        if self.out is not None:
+            self.out.close()
+            self.out = None
+
+
+def open_sink(spec):
+    '''
+    Open an audio sink from a command line spec: device[:<name or index>], null or file:<path>.
+    '''
+    kind, _, arg = spec.partition(':')
+    if kind == 'device':
+        return DeviceSink(int(arg) if arg.isdigit() else (arg or None))
+    if kind == 'null':
+        return NullSink()
+    if kind == 'file':
+        return WaveFileSink(arg)
+    raise ValueError('unknown audio sink {!r}'.format(spec))
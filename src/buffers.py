@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import numpy as np
+
+
+class FrameBuffers(object):
+    '''
+    The working images of a frame loop, allocated once per resolution and reused every frame.
+    OpenCV calls write into them through their dst= arguments, so a steady stream of frames
+    allocates no new full-size arrays (and gives the allocator and the garbage collector
+    nothing to churn on). A buffer is only reallocated when the shape or type it is asked for
+    changes, like after a change of detection scale; allocated counts how often that happened.
+    '''
+
+    def __init__(self):
+        self.arrays = {}
+        self.allocated = 0
+
+    def get(self, name, shape, dtype=np.uint8):
+        '''
+        The buffer called name, with the given shape and dtype. Its contents are whatever the
+        last user left in it.
+        '''
+        array = self.arrays.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = self.arrays[name] = np.empty(shape, dtype)
+            self.allocated += 1
+        return array
+
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Finger pad thresholds: the hand-tuned defaults, automatic calibration from sample frames
+# and the calibration profile file.
+# To calibrate from a recording: python3 calibration.py video:session.avi [calibration.json]
+
+## Import the relevant files
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from sources import open_source
+
+# default calibration for detecting finger pads
+#DEFAULT_CALIBRATION = {'h':[90,96],'s':[0,114],'v':[0,255]}
+DEFAULT_CALIBRATION = {'h':[71,101],'s':[113,255],'v':[0,255],'contours':[3175,12344]} #[3617,12344]
+
+# profile loaded at startup, next to the script
+PROFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibration.json')
+
+# trackbar limits: H is 0-179 in OpenCV, S and V 0-255, the blob areas 0-30000
+LIMITS = {'h': 179, 's': 255, 'v': 255, 'contours': 30000}
+
+
+class Thresholds(object):
+    '''
+    The current finger pad thresholds, as a calibration dict ({'h': [lower, upper], 's': ...,
+    'v': ..., 'contours': [min_area, max_area]}) plus the lower/upper HSV arrays inRange wants,
+    rebuilt only when a value changes. The trackbar callbacks call set(), so the frame loop
+    just reads the attributes instead of polling eight trackbars per frame. version goes up on
+    every change, for anything caching results of the old thresholds.
+    '''
+
+    def __init__(self, calibration=DEFAULT_CALIBRATION):
+        self.values = {key: list(bounds) for key, bounds in calibration.items()}
+        self.version = 0
+        self._update()
+
+    def set(self, key, index, value):
+        '''
+        Set the lower (index 0) or upper (index 1) bound of 'h', 's', 'v' or 'contours'.
+        '''
+        if self.values[key][index] != value:
+            self.values[key][index] = value
+            self._update()
+
+    def _update(self):
+        values = self.values
+        self.lower = np.array([values['h'][0], values['s'][0], values['v'][0]], np.uint8)
+        self.upper = np.array([values['h'][1], values['s'][1], values['v'][1]], np.uint8)
+        self.min_area, self.max_area = values['contours']
+        self.version += 1
+
+    def as_dict(self):
+        return {key: list(bounds) for key, bounds in self.values.items()}
+
+    def save(self, path=PROFILE):
+        save_profile(self.as_dict(), path)
+
+    def create_trackbars(self, window):
+        '''
+        One trackbar per bound in window, each updating these thresholds when it moves.
+        '''
+        names = [('H Upper', 'h', 1), ('H Lower', 'h', 0), ('S Upper', 's', 1), ('S Lower', 's', 0),
+                 ('V Upper', 'v', 1), ('V Lower', 'v', 0), ('Max Area', 'contours', 1), ('Min Area', 'contours', 0)]
+        for name, key, index in names:
+            cv2.createTrackbar(name, window, self.values[key][index], LIMITS[key], self._callback(key, index))
+
+    def _callback(self, key, index):
+        def callback(value):
+            self.set(key, index, value)
+        return callback
+
+
+def load_profile(path=PROFILE):
+    '''
+    The calibration saved in path, or the defaults when there is no profile yet.
+    '''
+    if not os.path.exists(path):
+        return dict(DEFAULT_CALIBRATION)
+    with open(path) as f:
+        profile = json.load(f)
+    calibration = dict(DEFAULT_CALIBRATION)
+    calibration.update((key, [int(v) for v in profile[key]]) for key in DEFAULT_CALIBRATION if key in profile)
+    return calibration
+
+
+def save_profile(calibration, path=PROFILE):
+    with open(path, 'w') as f:
+        json.dump(calibration, f, indent=2, sort_keys=True)
+
+
+def calibrate(frames, roi=None, min_saturation=60, min_value=80, hue_window=15, percentiles=(1, 99),
+              margins=(4, 20, 20), min_blob=200):
+    '''
+    Derive a calibration dict from a few frames that show the finger pads.
+
+    The pads are the most common strongly coloured hue: a hue histogram over the pixels with
+    at least min_saturation and min_value picks the peak, the pixels within hue_window of it
+    are taken as pad pixels, and the H/S/V bounds are their percentiles, widened by margins.
+    The area limits come from the blobs that mask then finds: half the smallest (10th
+    percentile) to twice the largest (90th percentile). roi (x0, y0, x1, y1) limits the
+    sampling to the pad area.
+    '''
+    samples = []
+    for frame in frames:
+        if roi is not None:
+            x0, y0, x1, y1 = roi
+            frame = frame[y0:y1, x0:x1]
+        samples.append(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV))
+    if not samples:
+        raise ValueError('calibration needs at least one frame')
+    pixels = np.concatenate([hsv.reshape(-1, 3) for hsv in samples])
+
+    coloured = pixels[(pixels[:, 1] >= min_saturation) & (pixels[:, 2] >= min_value)]
+    if not len(coloured):
+        raise ValueError('no coloured pixels to calibrate on, are the finger pads in view?')
+    histogram = np.bincount(coloured[:, 0], minlength=180).astype(np.float64)
+    # smooth over a few hue steps so one noisy bin does not win
+    histogram = np.convolve(histogram, np.ones(5) / 5, mode='same')
+    peak = int(np.argmax(histogram))
+
+    pad = coloured[np.abs(coloured[:, 0].astype(np.int16) - peak) <= hue_window]
+    calibration = {}
+    for channel, (key, margin) in enumerate(zip('hsv', margins)):
+        low, high = np.percentile(pad[:, channel], percentiles)
+        calibration[key] = [max(int(low) - margin, 0), min(int(np.ceil(high)) + margin, LIMITS[key])]
+
+    # blob areas under the new bounds
+    lower = np.array([calibration[key][0] for key in 'hsv'], np.uint8)
+    upper = np.array([calibration[key][1] for key in 'hsv'], np.uint8)
+    areas = []
+    for hsv in samples:
+        stats = cv2.connectedComponentsWithStats(cv2.inRange(hsv, lower, upper), connectivity=8)[2]
+        areas.extend(area for area in stats[1:, cv2.CC_STAT_AREA] if area >= min_blob)
+    if areas:
+        small, large = np.percentile(areas, (10, 90))
+        calibration['contours'] = [int(small / 2), min(int(large * 2), LIMITS['contours'])]
+    else:
+        calibration['contours'] = list(DEFAULT_CALIBRATION['contours'])
+    return calibration
+
+
+def calibrate_source(source, count=30, roi=None):
+    '''
+    Calibrate on the next count frames of a frame source.
+    '''
+    frames = []
+    while len(frames) < count:
+        ok, frame = source.read()
+        if not ok:
+            break
+        frames.append(frame)
+    return calibrate(frames, roi)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Calibrate the finger pad thresholds from sample frames')
+    parser.add_argument('source', help='camera[:port], video:<path>, images:<directory> or synthetic[:fingers]')
+    parser.add_argument('profile', nargs='?', default=PROFILE, help='where to save the calibration')
+    parser.add_argument('--frames', type=int, default=30, help='frames to sample')
+    args = parser.parse_args()
+
+    source = open_source(args.source)
+    calibration = calibrate_source(source, args.frames)
+    source.release()
+    save_profile(calibration, args.profile)
+    print('{}: {}'.format(args.profile, calibration))
+
+
+if __name__ == '__main__':
+    main()
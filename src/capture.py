@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import threading
+import time
+from collections import deque
+
+
+class FrameGrabber(object):
+    '''
+    Reads frames from a capture object (anything with read() and release(), like cv2.VideoCapture)
+    on a dedicated thread and keeps only the newest few in a small ring buffer. The processing loop
+    always gets the most recent frame, so a slow frame never makes the next one late.
+    '''
+
+    def __init__(self, cam, buffer_size=2):
+        self.cam = cam
+
+        # ring buffer of (frame index, capture timestamp, frame); old frames fall off the end
+        self.buffer = deque(maxlen=buffer_size)
+        self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
+
+        # counters for captured, processed and dropped frames
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+
+        # index of the last frame handed out to the processing loop
+        self.last_index = -1
+
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        '''
+        Start the capture thread.
+        '''
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, name='frame-grabber', daemon=True)
+        self.thread.start()
+        return self
+
+    def _capture_loop(self):
+        while self.running:
+            ok, frame = self.cam.read()
+            # camera unplugged or end of stream
+            if not ok or frame is None:
+                break
+            stamp = time.perf_counter()
+            with self.lock:
+                self.captured += 1
+                # a full buffer means the oldest frame was never processed
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped += 1
+                self.buffer.append((self.captured, stamp, frame))
+                self.new_frame.notify()
+        with self.lock:
+            self.running = False
+            self.new_frame.notify_all()
+
+    def read(self, timeout=1.0):
+        '''
+        Block until a frame newer than the last one handed out is available and return
+        (ok, frame). Every older frame still waiting in the buffer is dropped. ok is False when
+        the stream ended, or when no frame came within timeout seconds while running is still
+        True (a camera warming up or stalling): then it is worth reading again.
+        '''
+        index, stamp, frame = self.read_stamped(timeout)
+        return frame is not None, frame
+
+    def read_stamped(self, timeout=1.0):
+        '''
+        Same as read(), but returns (frame index, capture timestamp, frame) so callers can
+        measure how old the frame is. frame is None when the stream has ended (running is then
+        False) or when it timed out (running still True).
+        '''
+        with self.lock:
+            if not self.buffer:
+                self.new_frame.wait_for(lambda: self.buffer or not self.running, timeout)
+            if not self.buffer:
+                return self.last_index, None, None
+            index, stamp, frame = self.buffer.pop()
+            # anything left is older than the frame we just took
+            self.dropped += len(self.buffer)
+            self.buffer.clear()
+            self.processed += 1
+            self.last_index = index
+        return index, stamp, frame
+
+    def stats(self):
+        '''
+        Return the captured/processed/dropped counters as a dict.
+        '''
+        with self.lock:
+            return {'captured': self.captured, 'processed': self.processed, 'dropped': self.dropped}
+
+    def stop(self):
+        '''
+        Stop the capture thread and release the capture object.
+        '''
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+        self.cam.release()
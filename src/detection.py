@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+from buffers import FrameBuffers
+
+# A detected finger pad: centre (x, y), area in pixels, bounding box (x, y, w, h) and the
+# fitted ellipse (None unless ellipses were asked for)
+Blob = namedtuple('Blob', ['x', 'y', 'area', 'bbox', 'ellipse'])
+
+BACKENDS = ('contours', 'components')
+
+
+class FingerDetector(object):
+    '''
+    Turns a binary finger pad mask into blobs whose area lies between min_area and max_area.
+
+    backend 'contours' is the original path: findContours, then contourArea and moments for
+    every contour. backend 'components' gets area, bounding box and centroid for every blob
+    in one connectedComponentsWithStats call and filters them with a NumPy mask, so cluttered
+    frames with lots of holes and noise specks cost no extra Python work. Its areas are pixel
+    counts, a little larger than the polygon areas of the contour path.
+
+    find() runs the whole mask pipeline on a frame. It only looks inside roi (x0, y0, x1, y1,
+    in display coordinates, None for the whole frame) and works on a copy shrunk by scale.
+    Blob centres, boxes and areas come back in display coordinates and the area limits are
+    scaled to match, so the trackbars keep their meaning. Fingertip sized blobs are still
+    plenty big at scale 0.5, which cuts the per-frame pixel work by about 4x.
+
+    timer (an instrumentation.StageTimer) gets a lap for each of the 'convert', 'mask' and
+    'contours' stages of find(). The shrunk copy, the HSV image, the mask and the labels all
+    live in preallocated buffers (see buffers.FrameBuffers), so full finds allocate no images.
+
+    This is the 'hsv' method: the pad colour between the calibrated HSV bounds. Other methods
+    (see METHODS) are subclasses that only override make_mask(), which turns the (shrunk) pad
+    area into a binary finger mask, and set regions to False if they cannot refresh just part
+    of it (the motion gate then stays off), and rescales to False if a change of detection
+    scale would lose what they learned (the scheduler then keeps the scale).
+    '''
+    # whether find(region=...) can refresh part of the mask
+    regions = True
+    # whether set_scale() is harmless between frames
+    rescales = True
+
+    def __init__(self, backend='contours', scale=1.0, roi=None, timer=None):
+        if backend not in BACKENDS:
+            raise ValueError('unknown detector backend {!r}'.format(backend))
+        if not 0 < scale <= 1:
+            raise ValueError('detection scale must be in (0, 1], got {}'.format(scale))
+        self.backend = backend
+        self.scale = scale
+        self.roi = roi
+        self.timer = timer
+        self.buffers = FrameBuffers()
+
+        # detection resolution mask of the last find(), and where it sits in the frame
+        self.mask = None
+        self.mask_roi = None
+
+    def set_scale(self, scale):
+        '''
+        Change the detection resolution from the next find() on (a full one: the kept mask was
+        made at the old scale).
+        '''
+        if not 0 < scale <= 1:
+            raise ValueError('detection scale must be in (0, 1], got {}'.format(scale))
+        if scale != self.scale:
+            self.scale = scale
+            self.mask = None
+
+    def refines(self, frame):
+        '''
+        Whether find(region=...) on frame would only redo that region. When it would not (no
+        full find() yet, or since the scale or the frame size changed), it does a full pass
+        and returns every blob of the roi.
+        '''
+        return (self.regions and self.mask is not None and self._clip_roi(frame.shape) == self.mask_roi
+                and self._step() is not None)
+
+    def find(self, frame, lower_hsv, upper_hsv, min_area, max_area, fit_ellipses=False, region=None):
+        '''
+        Mask the finger pad colour in frame and return its blobs, in display coordinates.
+
+        region (x0, y0, x1, y1, display coordinates) only refreshes that part of the mask and
+        returns the blobs inside it; the rest of the mask is kept from earlier frames. It needs
+        a previous full find() and a scale of 1/k (1, 0.5, 0.25, ...) so the region lines up
+        with the shrunk mask, otherwise the whole roi is redone.
+        '''
+        if region is not None and self.refines(frame):
+            return self._find_region(frame, lower_hsv, upper_hsv, min_area, max_area, fit_ellipses, region)
+
+        x0, y0, x1, y1 = self.mask_roi = self._clip_roi(frame.shape)
+        view = frame[y0:y1, x0:x1]
+        scale = self.scale
+        if scale != 1:
+            # nearest neighbour keeps real pad colours (no blending across blob edges); the size
+            # is rounded like OpenCV does, so the buffer is used rather than replaced
+            shrunk = self.buffers.get('view', (int(round((y1 - y0) * scale)), int(round((x1 - x0) * scale)), 3))
+            view = cv2.resize(view, None, dst=shrunk, fx=scale, fy=scale, interpolation=cv2.INTER_NEAREST)
+
+        self.mask = self.make_mask(view, lower_hsv, upper_hsv)
+
+        area_scale = scale * scale
+        blobs = self.detect(self.mask, min_area * area_scale, max_area * area_scale, fit_ellipses)
+        self._lap('contours')
+        if scale == 1 and x0 == 0 and y0 == 0:
+            return blobs
+        return [self._to_display(blob, x0, y0) for blob in blobs]
+
+    def make_mask(self, view, lower_hsv, upper_hsv):
+        '''
+        Binary finger pad mask of view (the pad area at detection resolution).
+        '''
+        # generates an hsv version of the frame and masks the finger pad colour
+        hsv = cv2.cvtColor(view, cv2.COLOR_BGR2HSV, dst=self.buffers.get('hsv', view.shape))
+        self._lap('convert')
+        mask = cv2.inRange(hsv, lower_hsv, upper_hsv, dst=self.buffers.get('mask', view.shape[:2]))
+        self._lap('mask')
+        return mask
+
+    def _step(self):
+        # k for a scale of 1/k, None for other scales
+        k = int(round(1 / self.scale))
+        return k if abs(k * self.scale - 1) < 1e-9 else None
+
+    def _find_region(self, frame, lower_hsv, upper_hsv, min_area, max_area, fit_ellipses, region):
+        x0, y0, x1, y1 = self.mask_roi
+        k = self._step()
+        height, width = self.mask.shape
+
+        # the region in mask pixels, grown outwards to whole mask pixels
+        mx0 = max((region[0] - x0) // k, 0)
+        my0 = max((region[1] - y0) // k, 0)
+        mx1 = min(-(-(region[2] - x0) // k), width)
+        my1 = min(-(-(region[3] - y0) // k), height)
+        if mx1 <= mx0 or my1 <= my0:
+            return []
+
+        # every k-th frame pixel is exactly what the INTER_NEAREST resize of a full find() picks;
+        # the region's images are the top left corners of mask sized buffers
+        rh, rw = my1 - my0, mx1 - mx0
+        view = frame[y0 + my0 * k:y1:k, x0 + mx0 * k:x1:k][:rh, :rw]
+        if k != 1:
+            # (every k-th pixel is no image layout OpenCV takes, gather them first)
+            gathered = self.buffers.get('region_view', (height, width, 3))[:rh, :rw]
+            np.copyto(gathered, view)
+            view = gathered
+        hsv = cv2.cvtColor(view, cv2.COLOR_BGR2HSV, dst=self.buffers.get('region_hsv', (height, width, 3))[:rh, :rw])
+        self._lap('convert')
+        sub = self.mask[my0:my1, mx0:mx1]
+        cv2.inRange(hsv, lower_hsv, upper_hsv, dst=sub)
+        self._lap('mask')
+
+        # the blobs of a copy, the mask itself has to stay as it is
+        region_mask = self.buffers.get('region_mask', (height, width))[:rh, :rw]
+        np.copyto(region_mask, sub)
+        area_scale = self.scale * self.scale
+        blobs = self.detect(region_mask, min_area * area_scale, max_area * area_scale, fit_ellipses)
+        self._lap('contours')
+        return [self._to_display(blob, x0 + mx0 * k, y0 + my0 * k) for blob in blobs]
+
+    def _lap(self, stage):
+        if self.timer is not None:
+            self.timer.lap(stage)
+
+    def display_mask(self, shape, out=None):
+        '''
+        The last mask at full frame size (zero outside the detection roi), for the debug windows,
+        written into out if given.
+        '''
+        if out is None:
+            full = np.zeros(shape[:2], np.uint8)
+        else:
+            full = out
+            full.fill(0)
+        if self.mask is not None:
+            x0, y0, x1, y1 = self.mask_roi
+            cv2.resize(self.mask, (x1 - x0, y1 - y0), dst=full[y0:y1, x0:x1], interpolation=cv2.INTER_NEAREST)
+        return full
+
+    def _clip_roi(self, shape):
+        height, width = shape[:2]
+        if self.roi is None:
+            return 0, 0, width, height
+        x0, y0, x1, y1 = self.roi
+        return max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+
+    def _to_display(self, blob, x0, y0):
+        # map a blob found on the shrunk roi back to frame coordinates
+        s = self.scale
+        bx, by, bw, bh = blob.bbox
+        ellipse = blob.ellipse
+        if ellipse is not None:
+            (ex, ey), (ew, eh), angle = ellipse
+            ellipse = ((ex / s + x0, ey / s + y0), (ew / s, eh / s), angle)
+        return Blob(int(blob.x / s) + x0, int(blob.y / s) + y0, blob.area / (s * s),
+                    (int(bx / s) + x0, int(by / s) + y0, int(bw / s), int(bh / s)), ellipse)
+
+    def detect(self, mask, min_area, max_area, fit_ellipses=False):
+        '''
+        Return the blobs of mask with min_area < area < max_area. Ellipses are only fitted
+        (to the surviving blobs) when fit_ellipses is set, i.e. when someone will see them.
+        '''
+        if self.backend == 'components':
+            return self._detect_components(mask, min_area, max_area, fit_ellipses)
+        return self._detect_contours(mask, min_area, max_area, fit_ellipses)
+
+    def _detect_contours(self, mask, min_area, max_area, fit_ellipses):
+        # (OpenCV 3 returns image, contours, hierarchy; OpenCV 4 drops the image)
+        contours = cv2.findContours(mask, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)[-2]
+
+        blobs = []
+        for contour in contours:
+            # filter contour based on min/max area
+            area = cv2.contourArea(contour)
+            if not (area > min_area and area < max_area):
+                continue
+
+            # center of the contour
+            M = cv2.moments(contour)
+            cX = int(M["m10"] / M["m00"])
+            cY = int(M["m01"] / M["m00"])
+
+            ellipse = cv2.fitEllipse(contour) if fit_ellipses and len(contour) >= 5 else None
+            blobs.append(Blob(cX, cY, area, cv2.boundingRect(contour), ellipse))
+        return blobs
+
+    def _detect_components(self, mask, min_area, max_area, fit_ellipses):
+        # (labels of a region go into the top left corner of the buffer)
+        height, width = self.mask.shape if self.mask is not None else mask.shape
+        labels = self.buffers.get('labels', (height, width), np.int32)[:mask.shape[0], :mask.shape[1]]
+        # area, bounding box and centroid of every blob in one call (label 0 is the background),
+        # using the block based Grana labelling, which is the fastest on our masks
+        count, labels, stats, centroids = cv2.connectedComponentsWithStatsWithAlgorithm(mask, 8, cv2.CV_32S, cv2.CCL_GRANA,
+                                                                                        labels=labels)
+        areas = stats[1:, cv2.CC_STAT_AREA]
+        keep = np.flatnonzero((areas > min_area) & (areas < max_area)) + 1
+
+        blobs = []
+        for label in keep:
+            x, y, w, h = (int(v) for v in stats[label, :4])
+            ellipse = None
+            if fit_ellipses:
+                # outline of just this blob, cut out of its bounding box
+                blob_mask = cv2.compare(labels[y:y+h, x:x+w], float(label), cv2.CMP_EQ,
+                                        dst=self.buffers.get('blob_mask', (height, width))[:h, :w])
+                outline = cv2.findContours(blob_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x, y))[-2]
+                outline = max(outline, key=len)
+                if len(outline) >= 5:
+                    ellipse = cv2.fitEllipse(outline)
+            cX, cY = centroids[label]
+            blobs.append(Blob(int(cX), int(cY), int(stats[label, cv2.CC_STAT_AREA]), (x, y, w, h), ellipse))
+        return blobs
+
+
+class BackgroundDetector(FingerDetector):
+    '''
+    The 'mog2' method: fingers are whatever differs from the empty pad, whatever their colour.
+    A MOG2 background model learns what the pad looks like from the frames (and keeps
+    following slow lighting changes at learning_rate); the foreground, cleaned of specks by a
+    morphological opening, is the mask. The HSV bounds are not used, only the area limits.
+
+    The model starts from the first frame, so fingers already on the pad then only show up
+    once they move. A finger held perfectly still fades into the background after roughly
+    1 / learning_rate frames.
+    '''
+    regions = False
+    rescales = False
+
+    def __init__(self, backend='contours', scale=1.0, roi=None, timer=None, history=500, var_threshold=32,
+                 learning_rate=0.001):
+        FingerDetector.__init__(self, backend, scale, roi, timer)
+        self.learning_rate = learning_rate
+        # (a new frame size, like after set_scale(), restarts the model)
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history, var_threshold, detectShadows=False)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def make_mask(self, view, lower_hsv, upper_hsv):
+        self._lap('convert')
+        mask = self.subtractor.apply(view, fgmask=self.buffers.get('mask', view.shape[:2]),
+                                     learningRate=self.learning_rate)
+        cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel, dst=mask)
+        self._lap('mask')
+        return mask
+
+
+class ColourMotionDetector(BackgroundDetector):
+    '''
+    The 'hsv+motion' method: the pad colour mask, kept only where the pad differs from its
+    background model (grown a little so whole finger pads survive). Pad coloured things that
+    never move, like a sticker or a poster behind the pad, drop out, and lighting changes
+    that leave the colour bounds do not turn into touches.
+    '''
+
+    def make_mask(self, view, lower_hsv, upper_hsv):
+        hsv = cv2.cvtColor(view, cv2.COLOR_BGR2HSV, dst=self.buffers.get('hsv', view.shape))
+        self._lap('convert')
+        mask = cv2.inRange(hsv, lower_hsv, upper_hsv, dst=self.buffers.get('mask', view.shape[:2]))
+        moving = self.subtractor.apply(view, fgmask=self.buffers.get('moving', view.shape[:2]),
+                                       learningRate=self.learning_rate)
+        cv2.dilate(moving, self.kernel, dst=moving)
+        cv2.bitwise_and(mask, moving, dst=mask)
+        self._lap('mask')
+        return mask
+
+
+# finger detection methods, by name
+METHODS = {
+    'hsv': FingerDetector,
+    'mog2': BackgroundDetector,
+    'hsv+motion': ColourMotionDetector,
+}
+
+
+def open_detector(method='hsv', backend='contours', scale=1.0, roi=None, timer=None):
+    '''
+    A finger detector: method picks how the finger mask is made (see METHODS), backend how
+    its blobs are extracted (see BACKENDS).
+    '''
+    if method not in METHODS:
+        raise ValueError('unknown detection method {!r}, choose from {}'.format(method, ', '.join(METHODS)))
+    return METHODS[method](backend, scale=scale, roi=roi, timer=timer)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import threading
+import time
+
+import cv2
+
+# what can be shown: the pad with its overlay, the blob outlines and centres drawn on it,
+# the finger pad mask, and the frame cut out by the mask
+VIEWS = ('frame', 'blobs', 'mask', 'res')
+
+
+class Display(object):
+    '''
+    The display stage of a pad, refreshed at its own rate (fps) instead of once per detected
+    frame. The pad asks due() before drawing anything: only frames that will actually be shown
+    get the overlay, and only the enabled views (see VIEWS) are computed at all. publish()
+    hands the finished images over; show() puts the newest ones on screen and must be called
+    from the main thread, where HighGUI lives.
+
+    windows maps 'frame', 'mask' and 'res' to window names.
+    '''
+
+    def __init__(self, fps=30, views=VIEWS, windows=None):
+        unknown = set(views) - set(VIEWS)
+        if unknown:
+            raise ValueError('unknown views {}, choose from {}'.format(', '.join(sorted(unknown)), ', '.join(VIEWS)))
+        self.period = 1. / fps if fps else 0.
+        self.views = set(views)
+        self.windows = windows or {'frame': 'frame', 'mask': 'mask', 'res': 'tracker_window'}
+        self.next_due = 0.
+
+        # newest published images, and the ones on screen, swapped under the lock
+        self.lock = threading.Lock()
+        self.latest = None
+        self.shown = None
+        self.published = 0
+        self.refreshed = 0
+
+    def create_windows(self):
+        '''
+        Open the windows of the enabled views before the first frame (imshow would otherwise
+        open them during it): the frame and mask windows sized to their images, the tracker
+        window resizable, for its trackbars. Main thread only.
+        '''
+        if 'frame' in self.views:
+            cv2.namedWindow(self.windows['frame'], cv2.WINDOW_AUTOSIZE)
+        if 'mask' in self.views:
+            cv2.namedWindow(self.windows['mask'], cv2.WINDOW_AUTOSIZE)
+        cv2.namedWindow(self.windows['res'], 0)
+
+    def due(self, now=None):
+        '''
+        Whether the frame being processed should be drawn.
+        '''
+        return (now or time.perf_counter()) >= self.next_due
+
+    def publish(self, images, now=None):
+        '''
+        Hand over {view: image} for the next show(), and start waiting for the next refresh.
+        '''
+        now = now or time.perf_counter()
+        with self.lock:
+            self.latest = images
+            self.published += 1
+        # keep to the refresh rate without drifting, but never try to catch up on missed refreshes
+        self.next_due = max(self.next_due + self.period, now)
+
+    def show(self):
+        '''
+        Show the newest published images if they are not on screen yet. Returns whether it did.
+        '''
+        with self.lock:
+            images = self.latest
+        if images is None or images is self.shown:
+            return False
+        for view, image in images.items():
+            cv2.imshow(self.windows[view], image)
+        self.shown = images
+        self.refreshed += 1
+        return True
+
+    def stats(self):
+        return {'published': self.published, 'refreshed': self.refreshed}
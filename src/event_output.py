@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Note events out of the pad, for a synth running outside the vision loop (a dedicated audio
+# process, or any OSC/MIDI synth on the same host).
+#
+# Every frame that has events sends them as one OSC bundle over UDP (one datagram, no
+# connection, nothing to wait for), with one message per event under the pad's address:
+#   /<pad>/on ,iii          tile, MIDI note, velocity (1-127)
+#   /<pad>/off ,ii          tile, MIDI note
+#   /<pad>/instrument ,si   instrument name, General MIDI program (-1 for the drum kit)
+# MidiFileSink writes the same events to a standard MIDI file instead, and EventListener
+# decodes the bundles again (python3 event_output.py listen 9000 prints them).
+
+## Import the relevant files
+import argparse
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from notes import parse_note
+
+# kind is 'on', 'off' or 'instrument'; on/off carry the tile, MIDI note and velocity,
+# instrument events the instrument name and its General MIDI program
+OutputEvent = namedtuple('OutputEvent', ['kind', 'tile', 'note', 'velocity', 'instrument'])
+
+# General MIDI programs of the sample instruments; the drum samples play on the drum channel
+GM_PROGRAMS = {'piano': 0, 'trumpet': 56, 'bass_clarinet': 71, 'percussion': -1}
+DRUM_CHANNEL = 9
+# General MIDI drum notes of the percussion samples, by the start of their file name
+GM_DRUMS = {'bass-drum': 36, 'chinese-cymbal': 52, 'tambourine': 54, 'woodblock': 76}
+
+# OSC timetag meaning "now"
+IMMEDIATELY = 1
+
+
+def sample_note(sample):
+    '''
+    MIDI note of a sample file: its pitch, or its General MIDI drum note for percussion.
+    '''
+    midi = parse_note(sample)
+    if midi is None:
+        name = os.path.basename(sample)
+        midi = next((note for prefix, note in GM_DRUMS.items() if name.startswith(prefix)), 60)
+    return midi
+
+
+def velocity(area, min_area, max_area):
+    '''
+    MIDI velocity of a touch from its contact area: a finger pressed harder flattens into a
+    bigger blob, from 1 at min_area to 127 at max_area.
+    '''
+    span = max(max_area - min_area, 1)
+    return 1 + int(126 * min(max((area - min_area) / float(span), 0.), 1.))
+
+
+def instrument_event(instrument):
+    return OutputEvent('instrument', -1, GM_PROGRAMS.get(instrument, 0), 0, instrument)
+
+
+def _osc_string(text):
+    # null terminated, padded to 4 bytes
+    data = text.encode('utf-8') + b'\0'
+    return data + b'\0' * (-len(data) % 4)
+
+
+def osc_message(address, *args):
+    '''
+    Encode an OSC message with int32 and string arguments.
+    '''
+    tags = ','
+    payload = b''
+    for arg in args:
+        if isinstance(arg, str):
+            tags += 's'
+            payload += _osc_string(arg)
+        else:
+            tags += 'i'
+            payload += struct.pack('>i', int(arg))
+    return _osc_string(address) + _osc_string(tags) + payload
+
+
+def osc_bundle(messages, timetag=IMMEDIATELY):
+    '''
+    Encode encoded OSC messages as one bundle.
+    '''
+    parts = [_osc_string('#bundle'), struct.pack('>Q', timetag)]
+    for message in messages:
+        parts.append(struct.pack('>i', len(message)))
+        parts.append(message)
+    return b''.join(parts)
+
+
+def encode_events(prefix, events):
+    '''
+    One OSC bundle with a message per OutputEvent, under prefix ('/pad1').
+    '''
+    messages = []
+    for event in events:
+        if event.kind == 'on':
+            messages.append(osc_message(prefix + '/on', event.tile, event.note, event.velocity))
+        elif event.kind == 'off':
+            messages.append(osc_message(prefix + '/off', event.tile, event.note))
+        else:
+            messages.append(osc_message(prefix + '/instrument', event.instrument, event.note))
+    return osc_bundle(messages)
+
+
+def _read_string(data, pos):
+    end = data.index(b'\0', pos)
+    return data[pos:end].decode('utf-8'), end + 4 - (end - pos) % 4
+
+
+def decode_packet(data):
+    '''
+    [(address, [args])] of an OSC message or bundle (nested bundles included).
+    '''
+    if data.startswith(b'#bundle\0'):
+        messages = []
+        pos = 16
+        while pos < len(data):
+            size, = struct.unpack_from('>i', data, pos)
+            messages += decode_packet(data[pos + 4:pos + 4 + size])
+            pos += 4 + size
+        return messages
+
+    address, pos = _read_string(data, 0)
+    tags, pos = _read_string(data, pos)
+    args = []
+    for tag in tags[1:]:
+        if tag == 'i':
+            args.append(struct.unpack_from('>i', data, pos)[0])
+            pos += 4
+        elif tag == 'f':
+            args.append(struct.unpack_from('>f', data, pos)[0])
+            pos += 4
+        elif tag == 's':
+            value, pos = _read_string(data, pos)
+            args.append(value)
+        else:
+            raise ValueError('unsupported OSC type tag {!r}'.format(tag))
+    return [(address, args)]
+
+
+class OscSink(object):
+    '''
+    Sends each frame's events as one OSC bundle to a UDP port. send() never blocks: a
+    datagram the socket cannot take right away, or one nobody listens for, is dropped and
+    counted.
+    '''
+
+    def __init__(self, host='127.0.0.1', port=9000):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+        self.sent = 0
+        self.events = 0
+        self.dropped = 0
+
+    def send(self, pad, events, stamp=None):
+        try:
+            self.socket.sendto(encode_events('/' + pad, events), self.address)
+            self.sent += 1
+            self.events += len(events)
+        except OSError:
+            self.dropped += 1
+
+    def stats(self):
+        return {'bundles': self.sent, 'events': self.events, 'dropped': self.dropped}
+
+    def close(self):
+        self.socket.close()
+
+
+class MidiFileSink(object):
+    '''
+    Collects the events and writes them as a type 1 standard MIDI file on close(), one track
+    per pad, timed by the frame stamps (times on the pad's clock, counted from the first
+    batch). Each pad gets a MIDI channel of its own; the drum kit plays on the General MIDI
+    drum channel.
+    '''
+
+    # ticks per quarter note, at the default 120 bpm (500000 us per quarter note)
+    DIVISION = 480
+    TICKS_PER_SECOND = 960
+
+    def __init__(self, path):
+        self.path = path
+        # pad -> [(stamp, status bytes)], and its channel
+        self.tracks = {}
+        self.channels = {}
+        # (pad, tile) -> channel of its sounding note, so the note-off goes to the same channel
+        # after an instrument change
+        self.sounding = {}
+        self.start = None
+        self.events = 0
+        # pads send from their own threads
+        self.lock = threading.Lock()
+
+    def send(self, pad, events, stamp=None):
+        stamp = time.perf_counter() if stamp is None else stamp
+        with self.lock:
+            if self.start is None:
+                self.start = stamp
+            if pad not in self.tracks:
+                # channels 0-15 in turn, skipping the drum channel
+                index = len(self.channels) % 15
+                self.tracks[pad] = []
+                self.channels[pad] = [index if index < DRUM_CHANNEL else index + 1, False]
+            track = self.tracks[pad]
+            channel, drums = self.channels[pad]
+            for event in events:
+                if event.kind == 'instrument':
+                    drums = self.channels[pad][1] = event.note < 0
+                    if not drums:
+                        track.append((stamp, bytes([0xC0 | channel, event.note])))
+                    continue
+                if event.kind == 'on':
+                    playing = self.sounding[(pad, event.tile)] = DRUM_CHANNEL if drums else channel
+                    message = [0x90 | playing, event.note & 0x7f, event.velocity & 0x7f]
+                else:
+                    playing = self.sounding.pop((pad, event.tile), DRUM_CHANNEL if drums else channel)
+                    message = [0x80 | playing, event.note & 0x7f, 64]
+                track.append((stamp, bytes(message)))
+                self.events += 1
+
+    @staticmethod
+    def _varlen(value):
+        data = [value & 0x7f]
+        value >>= 7
+        while value:
+            data.append(0x80 | (value & 0x7f))
+            value >>= 7
+        return bytes(reversed(data))
+
+    def stats(self):
+        return {'events': self.events, 'tracks': len(self.tracks)}
+
+    def close(self):
+        chunks = []
+        for pad, track in self.tracks.items():
+            data = b'\x00\xff\x03' + self._varlen(len(pad)) + pad.encode('utf-8')
+            last = 0
+            for stamp, message in track:
+                tick = int(round((stamp - self.start) * self.TICKS_PER_SECOND))
+                data += self._varlen(max(tick - last, 0)) + message
+                last = max(tick, last)
+            data += b'\x00\xff\x2f\x00'
+            chunks.append(b'MTrk' + struct.pack('>I', len(data)) + data)
+        with open(self.path, 'wb') as f:
+            f.write(b'MThd' + struct.pack('>IHHH', 6, 1, len(chunks), self.DIVISION))
+            for chunk in chunks:
+                f.write(chunk)
+
+
+class EventListener(object):
+    '''
+    Receives the pad's OSC bundles on a local UDP port, for tests and for a synth process.
+    '''
+
+    def __init__(self, port=9000, host='127.0.0.1'):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind((host, port))
+        self.port = self.socket.getsockname()[1]
+
+    def receive(self, timeout=1.0):
+        '''
+        [(address, [args])] of the next bundle, or [] if none came within timeout seconds.
+        '''
+        self.socket.settimeout(timeout)
+        try:
+            data, _ = self.socket.recvfrom(65536)
+        except socket.timeout:
+            return []
+        return decode_packet(data)
+
+    def close(self):
+        self.socket.close()
+
+
+def open_output(spec):
+    '''
+    Open an event output from a command line spec: osc[:[host:]port] or midi:<path.mid>.
+    '''
+    kind, _, arg = spec.partition(':')
+    if kind == 'osc':
+        host, _, port = arg.rpartition(':')
+        return OscSink(host or '127.0.0.1', int(port) if port else 9000)
+    if kind == 'midi':
+        return MidiFileSink(arg or 'session.mid')
+    raise ValueError('unknown event output {!r}'.format(spec))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the note events a pad sends over OSC')
+    parser.add_argument('command', choices=['listen'])
+    parser.add_argument('port', type=int, nargs='?', default=9000)
+    args = parser.parse_args()
+
+    listener = EventListener(args.port)
+    try:
+        while True:
+            for address, values in listener.receive(timeout=None):
+                print(address, *values)
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+from collections import namedtuple
+
+# kind is 'on' or 'off', time is the timestamp of the frame that caused it
+NoteEvent = namedtuple('NoteEvent', ['kind', 'tile', 'time'])
+
+
+class TouchEventFilter(object):
+    '''
+    Turns per-frame tile occupancy into note-on/note-off events, so a held tile sounds once
+    instead of on every frame.
+
+    A tile has to stay occupied for debounce seconds before its note-on (0 = on the first
+    frame), and empty for release seconds before its note-off. The release window is the
+    hysteresis: a finger that drops out of the mask for a frame or two does not end the note
+    and retrigger it.
+    '''
+
+    def __init__(self, debounce=0.0, release=0.1):
+        self.debounce = debounce
+        self.release = release
+
+        # tile -> when it was first seen, for tiles waiting out the debounce window
+        self.pending = {}
+        # tile -> when it was last seen, for tiles whose note is on
+        self.active = {}
+
+    def update(self, tiles, now):
+        '''
+        Feed the tiles occupied in this frame (taken at time now); returns the new events.
+        '''
+        events = []
+        occupied = set(int(tile) for tile in tiles)
+
+        for tile in occupied:
+            if tile in self.active:
+                self.active[tile] = now
+                continue
+            since = self.pending.setdefault(tile, now)
+            if now - since >= self.debounce:
+                del self.pending[tile]
+                self.active[tile] = now
+                events.append(NoteEvent('on', tile, now))
+
+        # bounces: tiles that left again before their note-on
+        for tile in [tile for tile in self.pending if tile not in occupied]:
+            del self.pending[tile]
+
+        # note-off once a tile has been empty for the whole release window
+        for tile, last_seen in list(self.active.items()):
+            if tile not in occupied and now - last_seen >= self.release:
+                del self.active[tile]
+                events.append(NoteEvent('off', tile, now))
+        return events
+
+    def held(self):
+        '''
+        Tiles whose note is currently on.
+        '''
+        return sorted(self.active)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import csv
+import json
+import threading
+import time
+
+import numpy as np
+
+# stages of the frame loop, in order
+STAGES = ('capture', 'motion', 'convert', 'mask', 'contours', 'hit_test', 'overlay', 'gestures', 'imshow', 'audio')
+
+
+class StageTimer(object):
+    '''
+    Hot path timing of the frame loop. start() marks the beginning of a frame, and every lap()
+    charges the time since the previous mark to a stage, so instrumenting a stage costs one
+    perf_counter call and one array store.
+
+    Each stage keeps its last window samples in a ring buffer; percentiles() reports the
+    rolling p50/p95/p99 (in milliseconds) over them, along with the whole frame ('frame')
+    and anything added with record(), like the frame to sound latency.
+    '''
+
+    def __init__(self, window=1000, stages=STAGES):
+        self.window = window
+        # stage -> ring buffer of seconds, and how many samples it has seen
+        self.samples = {}
+        self.counts = {}
+        for stage in stages + ('frame',):
+            self._add(stage)
+        self.frame_start = self.mark = time.perf_counter()
+
+    def _add(self, stage):
+        self.samples[stage] = np.zeros(self.window)
+        self.counts[stage] = 0
+
+    def start(self):
+        '''
+        A new frame starts now.
+        '''
+        self.frame_start = self.mark = time.perf_counter()
+
+    def lap(self, stage):
+        '''
+        Charge the time since the last start() or lap() to stage.
+        '''
+        now = time.perf_counter()
+        self.record(stage, now - self.mark)
+        self.mark = now
+
+    def end(self):
+        '''
+        The frame is done: record its total time.
+        '''
+        self.record('frame', time.perf_counter() - self.frame_start)
+
+    def record(self, stage, seconds):
+        if stage not in self.samples:
+            self._add(stage)
+        count = self.counts[stage]
+        self.samples[stage][count % self.window] = seconds
+        self.counts[stage] = count + 1
+
+    def percentiles(self):
+        '''
+        {stage: {'count', 'mean', 'p50', 'p95', 'p99'}} in milliseconds over the rolling window,
+        for the stages that have samples.
+        '''
+        report = {}
+        for stage, samples in self.samples.items():
+            count = self.counts[stage]
+            if not count:
+                continue
+            recent = samples[:min(count, self.window)] * 1000
+            p50, p95, p99 = np.percentile(recent, (50, 95, 99))
+            report[stage] = {'count': count, 'mean': round(float(recent.mean()), 3), 'p50': round(float(p50), 3),
+                             'p95': round(float(p95), 3), 'p99': round(float(p99), 3)}
+        return report
+
+    def dump(self, path):
+        '''
+        Write the percentiles to path, as CSV if it ends in .csv, else as JSON.
+        '''
+        report = self.percentiles()
+        with open(path, 'w') as f:
+            if path.endswith('.csv'):
+                writer = csv.writer(f)
+                writer.writerow(['stage', 'count', 'mean', 'p50', 'p95', 'p99'])
+                for stage, row in report.items():
+                    writer.writerow([stage, row['count'], row['mean'], row['p50'], row['p95'], row['p99']])
+            else:
+                json.dump(report, f, indent=2)
+        return report
+
+    def summary(self):
+        '''
+        One line per stage, for the log.
+        '''
+        return '\n'.join('{:>14}: p50 {:7.3f}  p95 {:7.3f}  p99 {:7.3f} ms  ({} samples)'.format(
+            stage, row['p50'], row['p95'], row['p99'], row['count']) for stage, row in self.percentiles().items())
+
+
+class StartupTimer(object):
+    '''
+    When each startup milestone (sources opened, samples mapped, windows created, first frame,
+    first sound, ...) was reached, in seconds since origin (a perf_counter time, now by
+    default). Only the first mark() of a milestone counts, and any thread may mark one.
+    '''
+
+    def __init__(self, origin=None):
+        self.origin = origin or time.perf_counter()
+        # milestone -> seconds since origin, in the order they were reached
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    def mark(self, milestone, when=None):
+        '''
+        milestone was reached now (or at the perf_counter time when). Returns whether this was
+        the first time, the one that counts.
+        '''
+        with self.lock:
+            if milestone in self.marks:
+                return False
+            self.marks[milestone] = (when or time.perf_counter()) - self.origin
+            return True
+
+    def get(self, milestone):
+        return self.marks.get(milestone)
+
+    def summary(self):
+        '''
+        One line with every milestone, for the log.
+        '''
+        return ', '.join('{} {:.3f}s'.format(milestone, seconds)
+                         for milestone, seconds in sorted(self.marks.items(), key=lambda item: item[1]))
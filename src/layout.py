@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import numpy as np
+
+# Pad layouts as data: the x edges of the tile columns and the y edges of the tile rows.
+# Everything above the first row edge is the swipe area.
+LAYOUTS = {
+    # the original pad: 2x2 under a 100 px swipe area, rows split a little below the middle,
+    # its key labels huddled around the centre of the pad
+    '2x2': {'xs': [0, 325, 650], 'ys': [100, 290, 475], 'labels': [(275, 270), (340, 270), (275, 330), (340, 330)]},
+}
+
+# area the tiles of a generated RxC grid are spread over (x0, y0, x1, y1)
+PAD_BOUNDS = (0, 100, 650, 475)
+
+
+class TileLayout(object):
+    '''
+    A grid of tiles. Tiles are numbered row by row from the top left, so a 2x2 pad is
+    top left, top right, bottom left, bottom right.
+
+    Hit-testing goes through a label map, an image the size of the frame holding the tile
+    id of every pixel (-1 in the swipe area), so any number of points is resolved with one
+    vectorized lookup no matter how many tiles there are. A point on an edge belongs to the
+    tile left of / above it, and points past the last edge belong to the last column/row,
+    like the original hand-written comparisons.
+
+    labels optionally places the key label of every tile (the text origin); by default each
+    label is centred in its tile.
+    '''
+
+    def __init__(self, xs, ys, labels=None):
+        self.xs = [int(x) for x in xs]
+        self.ys = [int(y) for y in ys]
+        self.cols = len(self.xs) - 1
+        self.rows = len(self.ys) - 1
+        self.labels = [tuple(org) for org in labels] if labels else None
+        self.key = (tuple(self.xs), tuple(self.ys), tuple(self.labels or ()))
+
+        # swipe area above the tiles, and the pad boundaries
+        self.top = self.ys[0]
+        self.left, self.right, self.bottom = self.xs[0], self.xs[-1], self.ys[-1]
+        self.center_x = (self.left + self.right) // 2
+
+        # corner points (x0, y0, x1, y1) of every tile
+        self.rects = [(self.xs[c], self.ys[r], self.xs[c+1], self.ys[r+1])
+                      for r in range(self.rows) for c in range(self.cols)]
+
+        # frame shape -> label map
+        self.label_maps = {}
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    def label_map(self, shape):
+        '''
+        Tile id of every pixel of a frame with this shape, -1 in the swipe area.
+        '''
+        height, width = shape[:2]
+        labels = self.label_maps.get((height, width))
+        if labels is None:
+            # 'left' puts points on an edge into the tile before it
+            col = np.searchsorted(self.xs[1:-1], np.arange(width), side='left')
+            row = np.searchsorted(self.ys[1:-1], np.arange(height), side='left')
+            labels = (row[:, None] * self.cols + col[None, :]).astype(np.int16)
+            labels[:self.top] = -1
+            self.label_maps[(height, width)] = labels
+        return labels
+
+    def lookup(self, xs, ys, shape):
+        '''
+        Tile ids of the points (xs[i], ys[i]) as an array, -1 for points in the swipe area.
+        '''
+        labels = self.label_map(shape)
+        xs = np.clip(np.asarray(xs, np.intp), 0, labels.shape[1] - 1)
+        ys = np.clip(np.asarray(ys, np.intp), 0, labels.shape[0] - 1)
+        return labels[ys, xs]
+
+
+def grid_layout(rows, cols, bounds=PAD_BOUNDS):
+    '''
+    An evenly spaced rows x cols grid over bounds (x0, y0, x1, y1).
+    '''
+    x0, y0, x1, y1 = bounds
+    xs = np.linspace(x0, x1, cols + 1).round().astype(int)
+    ys = np.linspace(y0, y1, rows + 1).round().astype(int)
+    return TileLayout(xs, ys)
+
+
+def get_layout(name):
+    '''
+    A named layout from LAYOUTS, or an evenly spaced grid for 'RxC' (e.g. '4x4', '8x8').
+    '''
+    if name in LAYOUTS:
+        return TileLayout(**LAYOUTS[name])
+    try:
+        rows, cols = (int(n) for n in name.lower().split('x'))
+    except ValueError:
+        raise ValueError('unknown layout {!r}, use one of {} or RxC'.format(name, ', '.join(LAYOUTS)))
+    if rows < 1 or cols < 1:
+        raise ValueError('layout {!r} needs at least one row and column'.format(name))
+    return grid_layout(rows, cols)
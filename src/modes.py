@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Sound modes of the pad, keyed by (style, toggle).
+# Swipe left/right switches style, holding two fingers in the swipe area flips toggle.
+# Each tile is (label, colour) in top left, top right, bottom left, bottom right order (b,g,r);
+# layouts with more tiles repeat them.
+# SAMPLE_FILES holds the sample each tile plays in every mode, relative to WAV_DIR; pitched
+# modes on bigger grids play the chromatic scale from CHROMATIC instead.
+
+## Import the relevant files
+import os
+
+# title bar colour and swipe hint for each style
+STYLES = {
+    'percussion': {
+        'bar_color': (255, 255, 0),                                     # teal
+        'hint': ("<- Swipe Left for Wind", 'left', (255, 0, 191)),      # text, side, colour
+    },
+    'wind': {
+        'bar_color': (255, 0, 191),                                     # purple
+        'hint': ("Swipe Right for Percussion ->", 'right', (255, 255, 0)),  # text, side, colour
+    },
+}
+
+MODES = {
+    # percussion: piano sounds
+    ('percussion', 0): {
+        'title': ("Percussion (Piano)", 150),   # text, offset left of mid_x
+        'tiles': [("c1", (0, 0, 255)), ("e1", (255, 0, 0)), ("g1", (0, 255, 0)), ("c2", (0, 255, 255))],
+    },
+    # percussion: drum sounds
+    ('percussion', 1): {
+        'title': ("Percussion (Drums)", 150),
+        'tiles': [("BD", (0, 255, 255)), ("CYM", (0, 255, 0)), ("TAM", (255, 0, 0)), ("WB", (0, 0, 255))],
+    },
+    # wind: trumpet sounds
+    ('wind', 0): {
+        'title': ("Wind (Trumpet)", 100),
+        'tiles': [("a3", (0, 0, 255)), ("a4", (255, 0, 0)), ("a5", (0, 255, 0)), ("as3", (0, 255, 255))],
+    },
+    # wind: bass clarinet sounds
+    ('wind', 1): {
+        'title': ("Wind (Bass Clarinet)", 150),
+        'tiles': [("a2", (0, 255, 255)), ("a3", (0, 255, 0)), ("a4", (255, 0, 0)), ("a5", (0, 0, 255))],
+    },
+}
+
+# Sound samples from:
+# http://www.philharmonia.co.uk/explore/sound_samples/bass_clarinet?p=2
+WAV_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wav')
+
+# sample of each tile for every (style, toggle) mode, in the tile order of MODES
+SAMPLE_FILES = {
+    # Percussion (Piano)
+    ('percussion', 0): ['piano/c1.wav', 'piano/e1.wav', 'piano/g1.wav', 'piano/c2.wav'],
+    # Percussion (Battery)
+    ('percussion', 1): ['percussion/bass-drum__025_forte_bass-drum-mallet.wav',
+                        'percussion/chinese-cymbal__05_forte_damped.wav',
+                        'percussion/tambourine__025_forte_hand.wav',
+                        'percussion/woodblock__025_mezzo-forte_struck-singly.wav'],
+    # Wind (trumpet)
+    ('wind', 0): ['trumpet/trumpet_A3_025_forte_normal.wav', 'trumpet/trumpet_A4_025_forte_normal.wav',
+                  'trumpet/trumpet_A5_025_forte_normal.wav', 'trumpet/trumpet_As3_025_forte_normal.wav'],
+    # Wind (bass clarinet)
+    ('wind', 1): ['bass_clarinet/bass-clarinet_A2_025_forte_normal.wav', 'bass_clarinet/bass-clarinet_A3_025_forte_normal.wav',
+                  'bass_clarinet/bass-clarinet_A4_025_forte_normal.wav', 'bass_clarinet/bass-clarinet_A5_025_fortissimo_normal.wav'],
+}
+
+# Piano sounds (more): piano/a1.wav, piano/b1.wav, piano/d1.wav, piano/f1.wav
+
+# pitched modes play a chromatic scale on grids with more tiles than samples:
+# (instrument, lowest note); the other notes are resampled from the recorded ones (see notes.py)
+CHROMATIC = {
+    ('percussion', 0): ('piano', 'c1'),
+    ('wind', 0): ('trumpet', 'A3'),
+    ('wind', 1): ('bass_clarinet', 'A2'),
+}
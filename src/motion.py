@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import math
+
+import cv2
+import numpy as np
+
+from buffers import FrameBuffers
+
+
+class MotionGate(object):
+    '''
+    Cheap change detector in front of the finger pad detection.
+
+    check() shrinks the pad area by shrink (a bilinear halfway step, then area averaging: each
+    thumbnail pixel averages 16 frame pixels, which evens out sensor noise, for a tenth of a
+    millisecond instead of the half of a full area resize), converts it to grey and compares
+    it with a reference thumbnail. Thumbnail pixels that moved by more than threshold grey
+    levels are grown by margin pixels and grouped into changed regions (display coordinates).
+    An empty list means nothing changed, so the last touches still hold and the detection can
+    be skipped.
+
+    The reference is only refreshed where a change was reported, so the thumbnail is compared
+    with what the detector last looked at and slow drift (lighting creeping up a level a
+    frame) still adds up to a change eventually. The thumbnails live in preallocated buffers.
+    '''
+
+    def __init__(self, roi, threshold=12, shrink=8, margin=40, full_fraction=0.5):
+        self.roi = roi
+        self.threshold = threshold
+        self.shrink = shrink
+        self.margin = margin
+        # above this fraction of the pad area changed, the regions become the whole pad
+        self.full_fraction = full_fraction
+
+        self.reference = None
+        self.buffers = FrameBuffers()
+        grow = -(-margin // shrink)
+        self.kernel = np.ones((2 * grow + 1, 2 * grow + 1), np.uint8)
+        # frames check() called idle, for the exit stats
+        self.idle = 0
+        self.checked = 0
+
+    def reset(self):
+        '''
+        Forget the reference, so the next check() reports the whole pad (e.g. after the
+        thresholds change and the old touches are no longer valid).
+        '''
+        self.reference = None
+
+    def check(self, frame):
+        '''
+        Changed regions (x0, y0, x1, y1) of the pad area in frame, [] when it is unchanged.
+        '''
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.roi
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, width), min(y1, height)
+        full = [(x0, y0, x1, y1)]
+        self.checked += 1
+
+        size = (max((x1 - x0) // self.shrink, 1), max((y1 - y0) // self.shrink, 1))
+        shape = (size[1], size[0])
+        buffers = self.buffers
+        half = cv2.resize(frame[y0:y1, x0:x1], (size[0] * 2, size[1] * 2), dst=buffers.get('half', (shape[0] * 2, shape[1] * 2, 3)),
+                          interpolation=cv2.INTER_LINEAR)
+        small = cv2.resize(half, size, dst=buffers.get('small', shape + (3,)), interpolation=cv2.INTER_AREA)
+        thumb = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=buffers.get('thumb', shape))
+        if self.reference is None or self.reference.shape != thumb.shape:
+            self.reference = thumb.copy()
+            return full
+
+        diff = cv2.absdiff(thumb, self.reference, dst=buffers.get('diff', shape))
+        changed = cv2.compare(diff, self.threshold, cv2.CMP_GT, dst=buffers.get('changed', shape))
+        if not cv2.countNonZero(changed):
+            self.idle += 1
+            return []
+
+        # grow the changes by the margin so a finger that moved is covered end to end, then
+        # one region per connected group of changes
+        changed = cv2.dilate(changed, self.kernel, dst=buffers.get('grown', shape))
+        np.copyto(self.reference, thumb, where=changed.astype(bool))
+
+        count, _, stats, _ = cv2.connectedComponentsWithStats(changed, connectivity=8)
+        sx = (x1 - x0) / float(size[0])
+        sy = (y1 - y0) / float(size[1])
+        regions = []
+        for x, y, w, h, _ in stats[1:].tolist():
+            regions.append((x0 + int(x * sx), y0 + int(y * sy),
+                            min(x0 + int(math.ceil((x + w) * sx)), x1), min(y0 + int(math.ceil((y + h) * sy)), y1)))
+        if sum((rx1 - rx0) * (ry1 - ry0) for rx0, ry0, rx1, ry1 in regions) > self.full_fraction * (x1 - x0) * (y1 - y0):
+            # most of the pad changed (a hand sweeping over it, the lights): one full pass is cheaper
+            return full
+        return regions
+
+    def stats(self):
+        return {'checked': self.checked, 'idle': self.idle}
+
+
+def overlaps(bbox, region):
+    '''
+    Whether a blob bounding box (x, y, w, h) touches a region (x0, y0, x1, y1).
+    '''
+    x, y, w, h = bbox
+    return x < region[2] and x + w > region[0] and y < region[3] and y + h > region[1]
+
+
+def cover_blobs(regions, blobs):
+    '''
+    Grow the changed regions over the old blobs they touch, so re-detecting a region never
+    sees just part of a finger, and merge the regions that then overlap, so no blob is found
+    twice.
+    '''
+    grown = []
+    for x0, y0, x1, y1 in regions:
+        for blob in blobs:
+            if overlaps(blob.bbox, (x0, y0, x1, y1)):
+                x, y, w, h = blob.bbox
+                x0, y0, x1, y1 = min(x0, x), min(y0, y), max(x1, x + w), max(y1, y + h)
+        # fold in every region already kept that overlaps this one
+        for other in [r for r in grown if overlaps((r[0], r[1], r[2] - r[0], r[3] - r[1]), (x0, y0, x1, y1))]:
+            grown.remove(other)
+            x0, y0, x1, y1 = min(x0, other[0]), min(y0, other[1]), max(x1, other[2]), max(y1, other[3])
+        grown.append((x0, y0, x1, y1))
+    return grown
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Multi-process mode of the pad: capture and finger detection run in their own processes, so
+# the UI/audio loop (and the audio thread) never wait on the vision work and each stage gets
+# a core of its own instead of sharing one under the GIL.
+#
+#   capture process --frames--> shared memory ring --zero-copy--> detection process
+#   detection process --(frame index, blobs)--> results queue --> UI/audio process
+#
+# Frames never go through a pipe: the capture process writes them into preallocated slots of
+# one shared memory block and only the small blob lists are pickled. Nothing queues up: the
+# ring is overwritten in place and the results queue holds one entry, so a stage that falls
+# behind skips to the newest frame instead of working through a backlog.
+
+## Import the relevant files
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from detection import open_detector
+from sources import open_source
+
+# header of the ring: number of the latest complete frame, then one sequence number per slot
+LATEST = 0
+SEQ = 1
+
+
+class FrameRing(object):
+    '''
+    A ring of slots preallocated frame buffers in one shared memory block, with a seqlock per
+    slot. Frame n (counting from 1) goes into slot n % slots: the writer sets the slot's
+    sequence number to 2n - 1 (odd, being written), copies the frame in and sets it to 2n. A
+    reader that finds 2n both before and after using the slot knows the frame was neither torn
+    nor overwritten in between; otherwise it drops it. Readers never block the writer.
+    '''
+
+    def __init__(self, shape, slots=4, name=None):
+        self.shape = tuple(shape)
+        self.slots = slots
+        frame_bytes = int(np.prod(self.shape))
+        header_bytes = 8 * (SEQ + slots)
+        self.owner = name is None
+        self.memory = shared_memory.SharedMemory(name=name, create=self.owner, size=header_bytes + slots * frame_bytes)
+        self.name = self.memory.name
+
+        self.header = np.ndarray((SEQ + slots,), np.int64, self.memory.buf)
+        self.frames = np.ndarray((slots,) + self.shape, np.uint8, self.memory.buf, header_bytes)
+        if self.owner:
+            self.header[:] = 0
+
+    def latest(self):
+        return int(self.header[LATEST])
+
+    def write(self, frame):
+        '''
+        Publish frame as the next frame; returns its number.
+        '''
+        n = self.latest() + 1
+        slot = SEQ + n % self.slots
+        self.header[slot] = 2 * n - 1
+        self.frames[n % self.slots] = frame
+        self.header[slot] = 2 * n
+        self.header[LATEST] = n
+        return n
+
+    def view(self, n):
+        '''
+        Zero-copy view of frame n, or None if it has already been overwritten. Check valid(n)
+        again after using it.
+        '''
+        return self.frames[n % self.slots] if self.valid(n) else None
+
+    def valid(self, n):
+        return self.header[SEQ + n % self.slots] == 2 * n
+
+    def copy(self, n, out=None):
+        '''
+        Copy of frame n (into out if given), or None if it was overwritten before or during the copy.
+        '''
+        if not self.valid(n):
+            return None
+        if out is None:
+            out = self.frames[n % self.slots].copy()
+        else:
+            np.copyto(out, self.frames[n % self.slots])
+        return out if self.valid(n) else None
+
+    def close(self):
+        # drop our views before closing the mapping under them
+        self.header = self.frames = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def capture_main(spec, ring_name, shape, slots, new_frame, stop, stamps):
+    '''
+    Capture process: read frames from the source and publish them into the ring.
+    '''
+    ring = FrameRing(shape, slots, ring_name)
+    source = open_source(spec)
+    try:
+        while not stop.is_set():
+            ok, frame = source.read()
+            if not ok or frame is None or frame.shape != ring.shape:
+                break
+            # (perf_counter is the system wide monotonic clock, so stamps compare across processes)
+            stamps[(ring.latest() + 1) % slots] = time.perf_counter()
+            ring.write(frame)
+            with new_frame:
+                new_frame.notify_all()
+    finally:
+        source.release()
+        stop.set()
+        with new_frame:
+            new_frame.notify_all()
+        ring.close()
+
+
+def detection_main(ring_name, shape, slots, new_frame, stop, stamps, results, thresholds, options):
+    '''
+    Detection process: find the finger pads in the newest frame of the ring, zero-copy, and
+    publish (frame number, capture stamp, blobs). Frames that arrive while it is busy are skipped.
+    '''
+    ring = FrameRing(shape, slots, ring_name)
+    detector = open_detector(options['method'], options['backend'], scale=options['scale'], roi=options['roi'])
+    version = None
+    last = 0
+    torn = 0
+    try:
+        while True:
+            with new_frame:
+                new_frame.wait_for(lambda: ring.latest() > last or stop.is_set(), 0.5)
+            n = ring.latest()
+            if n <= last:
+                if stop.is_set():
+                    break
+                continue
+            last = n
+
+            # thresholds are written by the UI process, rebuild the bounds when they change
+            with thresholds.get_lock():
+                if thresholds[0] != version:
+                    version = thresholds[0]
+                    hl, hu, sl, su, vl, vu, min_area, max_area = thresholds[1:]
+                    lower = np.array([hl, sl, vl], np.uint8)
+                    upper = np.array([hu, su, vu], np.uint8)
+
+            frame = ring.view(n)
+            if frame is None:
+                continue
+            blobs = detector.find(frame, lower, upper, min_area, max_area, fit_ellipses=options['ellipses'])
+            stamp = stamps[n % slots]
+            if not ring.valid(n):
+                # overwritten while we were reading it
+                torn += 1
+                continue
+
+            # the queue holds one result: replace a stale one rather than wait for the reader
+            try:
+                results.put_nowait((n, stamp, blobs))
+            except queue.Full:
+                try:
+                    results.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    results.put_nowait((n, stamp, blobs))
+                except queue.Full:
+                    pass
+    finally:
+        try:
+            results.put((None, torn, None), timeout=1.0)
+        except queue.Full:
+            pass
+        ring.close()
+
+
+class ProcessPipeline(object):
+    '''
+    Runs capture and detection in two processes and hands the UI loop (frame, stamp, blobs)
+    for the newest detected frame. spec is a source spec (see sources.open_source): the
+    capture process opens the source itself, after the pipeline has opened it once to learn
+    the frame size.
+
+    read() only hands over the number of the frame: frame() copies it out of the ring, for the
+    frames that get drawn on. shape is the frame shape, which is all the hit-test needs.
+
+    set_thresholds() passes new threshold values (from the trackbars) to the detection
+    process. Frames the detector or the UI could not keep up with are dropped, never queued;
+    stats() counts them.
+    '''
+
+    def __init__(self, spec, backend='contours', scale=1.0, roi=None, ellipses=False, slots=4, method='hsv'):
+        self.spec = spec
+        self.options = {'method': method, 'backend': backend, 'scale': scale, 'roi': roi, 'ellipses': ellipses}
+        self.slots = slots
+        # spawn, not fork: the children must not inherit OpenCV or audio threads
+        self.context = mp.get_context('spawn')
+        self.ring = None
+        self.shape = None
+        self.processes = []
+
+        self.captured = 0
+        self.received = 0
+        self.torn = 0
+
+    def start(self, thresholds):
+        probe = open_source(self.spec)
+        ok, first = probe.read()
+        probe.release()
+        if not ok:
+            raise IOError('could not read a frame from {}'.format(self.spec))
+
+        ctx = self.context
+        self.ring = FrameRing(first.shape, self.slots)
+        self.shape = first.shape
+        self.new_frame = ctx.Condition()
+        self.stop_event = ctx.Event()
+        self.stamps = ctx.RawArray('d', self.slots)
+        self.results = ctx.Queue(maxsize=1)
+        # version, then h, s, v lower/upper and min/max area
+        self.thresholds = ctx.Array('i', 9)
+        self.set_thresholds(thresholds)
+
+        ring_args = (self.ring.name, first.shape, self.slots, self.new_frame, self.stop_event, self.stamps)
+        self.processes = [
+            ctx.Process(target=detection_main, args=ring_args + (self.results, self.thresholds, self.options),
+                        name='pad-detection', daemon=True),
+            ctx.Process(target=capture_main, args=(self.spec,) + ring_args, name='pad-capture', daemon=True),
+        ]
+        for process in self.processes:
+            process.start()
+        return self
+
+    def set_thresholds(self, thresholds):
+        '''
+        Send a calibration.Thresholds to the detection process.
+        '''
+        values = thresholds.values
+        with self.thresholds.get_lock():
+            self.thresholds[1:] = values['h'] + values['s'] + values['v'] + values['contours']
+            self.thresholds[0] = thresholds.version
+
+    def read(self, timeout=1.0):
+        '''
+        (frame number, capture stamp, blobs) of the newest detected frame, or (None, None, None)
+        once the source has ended.
+        '''
+        while True:
+            try:
+                n, stamp, blobs = self.results.get(timeout=timeout)
+            except queue.Empty:
+                if self.stop_event.is_set() or not any(p.is_alive() for p in self.processes):
+                    return None, None, None
+                continue
+            if n is None:
+                # the detection process is done
+                self.torn = stamp
+                return None, None, None
+            self.received += 1
+            return n, stamp, blobs
+
+    def frame(self, n, out):
+        '''
+        Copy frame n into out (an array of the frame shape) for the caller to draw on. Returns
+        out, or None if the capture process has already overwritten the frame.
+        '''
+        return self.ring.copy(n, out)
+
+    def stats(self):
+        captured = self.ring.latest() if self.ring is not None else self.captured
+        return {'captured': captured, 'processed': self.received, 'dropped': captured - self.received, 'torn': self.torn}
+
+    def stop(self):
+        self.stop_event.set()
+        with self.new_frame:
+            self.new_frame.notify_all()
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        self.captured = self.ring.latest()
+        self.results.close()
+        self.ring.close()
+        self.ring = None
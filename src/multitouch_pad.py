@@ -2,455 +2,234 @@
 # -*- coding: utf-8 -*-
 
 # To run: python3 multitouch_pad.py
+# Without a camera, display or sound card:
+#   python3 multitouch_pad.py --headless --audio null --source video:session.avi
+# (sources: camera[:port], video:<path>, images:<directory>, synthetic[:fingers])
+# Several pads from one process, sharing the samples and the sound output:
+#   python3 multitouch_pad.py --source camera:0 --source camera:1
+# Note events to a synth in another process (python3 event_output.py listen 9000 prints them):
+#   python3 multitouch_pad.py --mute --events osc:9000
+# Record a session, then bounce it to session.wav (see session.py):
+#   python3 multitouch_pad.py --record session.mtp
+#   python3 session.py render session.mtp
 
 ## Import the relevant files
 from sys import exit
-import cv2
-import numpy as np
-import simpleaudio as sa
-
-# Initialize the camera
-cam_port         = 0   # I've set my camera port to port zero!
-cam              = cv2.VideoCapture(cam_port)   # I've created my camera object!
-
-# Sound samples from:
-# http://www.philharmonia.co.uk/explore/sound_samples/bass_clarinet?p=2
-
-# Percussion (Piano) 
-piano_c1 = sa.WaveObject.from_wave_file("sounds/piano/c1.wav")
-piano_e1 = sa.WaveObject.from_wave_file("sounds/piano/e1.wav")
-piano_g1 = sa.WaveObject.from_wave_file("sounds/piano/g1.wav")
-piano_c2 = sa.WaveObject.from_wave_file("sounds/piano/c2.wav")
-
-# Percussion (Battery)
-perc_bass_drum = sa.WaveObject.from_wave_file("sounds/percussion/bass-drum__025_forte_bass-drum-mallet.wav")
-perc_cymbal = sa.WaveObject.from_wave_file("sounds/percussion/chinese-cymbal__05_forte_damped.wav")
-perc_tambourine = sa.WaveObject.from_wave_file("sounds/percussion/tambourine__025_forte_hand.wav")
-perc_woodblock = sa.WaveObject.from_wave_file("sounds/percussion/woodblock__025_mezzo-forte_struck-singly.wav")
-
-# Wind (trumpet)
-trumpet_a3 = sa.WaveObject.from_wave_file("sounds/trumpet/trumpet_A3_025_forte_normal.wav")
-trumpet_a4 = sa.WaveObject.from_wave_file("sounds/trumpet/trumpet_A4_025_forte_normal.wav")
-trumpet_a5 = sa.WaveObject.from_wave_file("sounds/trumpet/trumpet_A5_025_forte_normal.wav")
-trumpet_as3 = sa.WaveObject.from_wave_file("sounds/trumpet/trumpet_As3_025_forte_normal.wav")
-
-# Wind (bass clarinet)
-bass_clarinet_a2 = sa.WaveObject.from_wave_file("sounds/bass_clarinet/bass-clarinet_A2_025_forte_normal.wav")
-bass_clarinet_a3 = sa.WaveObject.from_wave_file("sounds/bass_clarinet/bass-clarinet_A3_025_forte_normal.wav")
-bass_clarinet_a4 = sa.WaveObject.from_wave_file("sounds/bass_clarinet/bass-clarinet_A4_025_forte_normal.wav")
-bass_clarinet_a5 = sa.WaveObject.from_wave_file("sounds/bass_clarinet/bass-clarinet_A5_025_fortissimo_normal.wav")
-
-# Piano sounds (more)
-#piano_a1 = sa.WaveObject.from_wave_file("sounds/piano/a1.wav")
-#piano_b1 = sa.WaveObject.from_wave_file("sounds/piano/b1.wav")
-#piano_d1 = sa.WaveObject.from_wave_file("sounds/piano/d1.wav")
-#piano_f1 = sa.WaveObject.from_wave_file("sounds/piano/f1.wav")
-
-
-def empty_callback(x):
+import argparse
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from audio import AudioEngine, open_sink
+from calibration import PROFILE
+from detection import BACKENDS, METHODS
+from display import VIEWS, Display
+from event_output import open_output
+from instrumentation import StartupTimer
+from layout import LAYOUTS
+from modes import SAMPLE_FILES, WAV_DIR
+from notes import NoteSynth
+from pad import Pad, run_pads
+from samplebank import SampleLibrary
+from sources import open_source
+
+log = logging.getLogger('multitouch_pad')
+
+
+def scan(source, audio=None, headless=False, max_frames=None, detector='contours', method='hsv', detect_scale=1.0,
+         layout='2x2', debounce=0.0, release=0.1, motion_gate=False, motion_threshold=12, profile=PROFILE,
+         calibrate_frames=0, timings=None, processes=False, workers=None, display_fps=30, views=VIEWS, output=None,
+         record=None, target_fps=0, startup=None):
     '''
-    Empty function for callback when slider positions change. Need input x, this is the value 
-    the slider has changed to. You don't need to do anything in this function.
+    Run the pad on frames from source (a frame source or a source spec like 'camera:0'),
+    playing sounds through the audio engine (None for no sound). headless skips every HighGUI
+    window (and with them the threshold trackbars), and processes frames as fast as the source
+    delivers them. Otherwise the windows refresh at display_fps, independently of the
+    detection rate, and only the views listed in views (see display.VIEWS) are drawn.
+    method picks how fingers are found ('hsv' pad colour, 'mog2' background subtraction or
+    'hsv+motion', see detection.METHODS), detector the blob extraction backend ('contours' or
+    'components') and detect_scale the resolution the finger pad mask is computed at (0.5 =
+    half size). layout names the tile grid ('2x2', '4x4', ...). A tile sounds once when a
+    finger lands on it; debounce and release are how long (in seconds) it must stay occupied
+    before its note-on and empty before its note-off; recorded sources count them in seconds
+    of the recording, so a replay plays the same notes at any speed.
+    motion_gate only re-detects the parts of the pad that changed by more than motion_threshold
+    grey levels since they were last detected, and keeps the last touches while nothing does.
+    The finger pad thresholds come from the calibration profile file (the defaults if there is
+    none, or a calibration dict instead of the file, see pad.Pad); calibrate_frames > 0 first
+    recalibrates on that many frames and saves the profile.
+    Every stage of the loop is timed; the rolling percentiles are logged on exit and written to
+    timings (.json or .csv) on exit and on demand (the t key, or SIGUSR1 when headless).
+    processes moves capture and detection into processes of their own (see multiproc), which
+    needs source as a spec; this loop then only draws, tracks and plays. The motion gate and
+    the mask windows are not available in that mode.
+    A list of sources runs one pad per source on a pool of workers threads (see pad.run_pads),
+    all sharing one sample library, note synth and the audio engine; their windows and timings
+    files get the pad name (pad1, pad2, ...) added.
+    output is an event output (see event_output.open_output) that gets every frame's note and
+    instrument events as one batch, addressed by pad name; it is closed on exit. record is the
+    path of a session log to write (one per pad, named like the timings files).
+    target_fps > 0 paces every pad to that rate and lowers the drawing and detection quality
+    while frames take longer than that (see scheduler.py); every change is logged.
+    Startup opens the sources, maps the samples and starts the sound output concurrently while
+    the windows are created. startup (an instrumentation.StartupTimer, started now by default)
+    times each of these, the first frame and the first sound; they are logged once the pads
+    are ready and again on exit.
     '''
-    pass
-
-def scan():
-
-    # default calibration for detecting finger pads
-    #default_calibration = {'h':[90,96],'s':[0,114],'v':[0,255]}    
-    default_calibration = {'h':[71,101],'s':[113,255],'v':[0,255],'contours':[3175,12344]} #[3617,12344]
-
-    # create window
-    cv2.namedWindow('tracker_window',0)        
-    
-    # H: 0-179
-    cv2.createTrackbar('H Upper',"tracker_window",default_calibration['h'][1],179, empty_callback)
-    cv2.createTrackbar('H Lower',"tracker_window",default_calibration['h'][0],179, empty_callback)
-
-    # S: 0-255
-    cv2.createTrackbar('S Upper',"tracker_window",default_calibration['s'][1],255, empty_callback)
-    cv2.createTrackbar('S Lower',"tracker_window",default_calibration['s'][0],255, empty_callback)
-
-    # V: 0-255
-    cv2.createTrackbar('V Upper',"tracker_window",default_calibration['v'][1],255, empty_callback)
-    cv2.createTrackbar('V Lower',"tracker_window",default_calibration['v'][0],255, empty_callback)
-
-    # Contours
-    cv2.createTrackbar('Max Area',"tracker_window",default_calibration['contours'][1],30000, empty_callback)
-    cv2.createTrackbar('Min Area',"tracker_window",default_calibration['contours'][0],30000, empty_callback)
-
-    # Check which quadrant user has tapped
-    tap_top_left = False
-    tap_top_right = False
-    tap_bottom_left = False
-    tap_bottom_right = False
-
-    # counter for # of iterations where user is holding down one finger at swipe area
-    hold_counter = 0
-    initial_side_set = False
-    initial_swipe_side = None
-
-    # starting sound style
-    style = 'percussion'
-    toggle = 0          # toggle between sound types: Percussion: Piano <-> Drums, Wind: Trumpet <-> Bass Clarinet
-    toggle_counter = 0  # make sure user is holding down two fingers long enough to toggle
-
-    while True:
-
-        # Captures a frame of video from the camera object
-        _,frame = cam.read()
-
-        # generates an hsv version of frame and stores it in the hsv image variable
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV) 
-
-        # hue upper lower
-        hu = cv2.getTrackbarPos('H Upper','tracker_window')
-        hl = cv2.getTrackbarPos('H Lower','tracker_window')
-        # saturation upper lower
-        su = cv2.getTrackbarPos('S Upper','tracker_window')
-        sl = cv2.getTrackbarPos('S Lower','tracker_window')
-        # value upper lower
-        vu = cv2.getTrackbarPos('V Upper','tracker_window')
-        vl = cv2.getTrackbarPos('S Lower','tracker_window')
-
-        # get hsv values from trackbar
-        lower_hsv = np.array([hl,sl,vl])
-        upper_hsv = np.array([hu,su,vu])
-        
-        # mask image
-        mask = cv2.inRange(hsv, lower_hsv, upper_hsv)
-        res = cv2.bitwise_and(frame,frame, mask= mask)
-
-        # get image contours
-        ret,thresh = cv2.threshold(mask,127,255,0)
-        im2, contours, hierarchy = cv2.findContours(thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-
-        # value upper lower
-        max_area= cv2.getTrackbarPos('Max Area','tracker_window')
-        min_area = cv2.getTrackbarPos('Min Area','tracker_window')
-
-        # overlay transparency 
-        alpha = 0.35            # transparency for tiles
-        offset_alpha = 0.7      # transparency for offset/title area
-
-        # dividing lines
-        offset = 100                    # leave swipe area on the top
-        mid_x = 325                     # mid intersection area
-        mid_y = 240 + int(offset/2)     # account for offset area
-        max_x = 650                     # max boundary for x
-        max_y = 475                     # max boundary for y
-        cv2.line(frame,(0,offset),(max_x,offset),(0,0,0),5)         # offset divider
-        cv2.line(frame,(mid_x,offset),(mid_x,max_y),(0,0,0),5)      # vertical divider
-        cv2.line(frame,(0,mid_y),(max_x,mid_y),(0,0,0),5)           # horizontal divider
-        
-        # percussion color overlay - teal
-        if style=='percussion':
-            # create title bar percussion style
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (max_x, offset), (255, 255, 0), -1)
-            cv2.addWeighted(overlay, offset_alpha, frame, 1 - offset_alpha, 0, frame)
-            cv2.putText(frame, "<- Swipe Left for Wind", (10, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 191), 2)
-            # percussion: piano sounds
-            if toggle==0:
-                # text for percussion sound type (piano)
-                cv2.putText(frame, "Percussion (Piano)", (mid_x-150, int(offset/2)+10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3)
-                # text for piano key 
-                cv2.putText(frame, "c1", (mid_x - 50, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3) # c1
-                cv2.putText(frame, "e1", (mid_x + 15, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 3) # e1
-                cv2.putText(frame, "g1", (mid_x - 50, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3) # g1
-                cv2.putText(frame, "c2", (mid_x + 15, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3) # c2
-                # color for piano tile
-                cv2.rectangle(frame,(0,offset),(mid_x,mid_y),(0,0,255),3) 
-                cv2.rectangle(frame,(mid_x,offset),(max_x,mid_y),(255,0,0),3) 
-                cv2.rectangle(frame,(0,mid_y),(mid_x,max_y),(0,255,0),3) 
-                cv2.rectangle(frame,(mid_x,mid_y),(max_x,max_y),(0,255,255),3) 
-            # perussion: drum sounds
-            if toggle==1:
-                # text for percussion sound type (drums)
-                cv2.putText(frame, "Percussion (Drums)", (mid_x-150, int(offset/2)+10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3)
-                # text for drum key
-                cv2.putText(frame, "BD", (mid_x - 50, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3) # bass drum
-                cv2.putText(frame, "CYM", (mid_x + 15, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3) # cymbal
-                cv2.putText(frame, "TAM", (mid_x - 50, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 3) # tambourine
-                cv2.putText(frame, "WB", (mid_x + 15, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3) # woodblock
-                # color for drum tile
-                cv2.rectangle(frame,(0,offset),(mid_x,mid_y),(0,255,255),3) 
-                cv2.rectangle(frame,(mid_x,offset),(max_x,mid_y),(0,255,0),3) 
-                cv2.rectangle(frame,(0,mid_y),(mid_x,max_y),(255,0,0),3) 
-                cv2.rectangle(frame,(mid_x,mid_y),(max_x,max_y),(0,0,255),3) 
-
-        # wind color overlay - purple
-        elif style=='wind':
-            # create title bar for wind style
-            overlay = frame.copy()
-            cv2.rectangle(overlay, (0, 0), (max_x, offset), (255, 0, 191), -1)
-            cv2.addWeighted(overlay, offset_alpha, frame, 1 - offset_alpha, 0, frame)
-            cv2.putText(frame, "Swipe Right for Percussion ->", (mid_x+50, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
-            # wind: trumpet sounds
-            if toggle==0: 
-                # text for wind sound type (trumpet)
-                cv2.putText(frame, "Wind (Trumpet)", (mid_x-100, int(offset/2)+10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3) # current style
-                # text for trumpet key 
-                cv2.putText(frame, "a3", (mid_x - 50, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3) # a3
-                cv2.putText(frame, "a4", (mid_x + 15, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 3) # a4
-                cv2.putText(frame, "a5", (mid_x - 50, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3) # a5
-                cv2.putText(frame, "as3", (mid_x + 15, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3) # as3
-                # color for trumpet tile
-                cv2.rectangle(frame,(0,offset),(mid_x,mid_y),(0,0,255),3) 
-                cv2.rectangle(frame,(mid_x,offset),(max_x,mid_y),(255,0,0),3) 
-                cv2.rectangle(frame,(0,mid_y),(mid_x,max_y),(0,255,0),3) 
-                cv2.rectangle(frame,(mid_x,mid_y),(max_x,max_y),(0,255,255),3) 
-            # wind: bass clarinet sounds
-            if toggle==1:
-                # text for wind sound type (bass clarinet)
-                cv2.putText(frame, "Wind (Bass Clarinet)", (mid_x-150, int(offset/2)+10), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 3) # current style
-                # text for bass clarinet key
-                cv2.putText(frame, "a2", (mid_x - 50, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 3) # a2
-                cv2.putText(frame, "a3", (mid_x + 15, mid_y - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 3) # a3
-                cv2.putText(frame, "a4", (mid_x - 50, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 3) # a4
-                cv2.putText(frame, "a5", (mid_x + 15, mid_y + 40), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 3) # a5
-                # color for bass clarinet tile
-                cv2.rectangle(frame,(0,offset),(mid_x,mid_y),(0,255,255),3) 
-                cv2.rectangle(frame,(mid_x,offset),(max_x,mid_y),(0,255,0),3) 
-                cv2.rectangle(frame,(0,mid_y),(mid_x,max_y),(255,0,0),3) 
-                cv2.rectangle(frame,(mid_x,mid_y),(max_x,max_y),(0,0,255),3) 
-
-        # filtered_contours = []
-
-        # counter for keeping track of how many fingers user has on the touch pad during this iteration
-        finger_counter = 0
-
-        # filter out contours based on area
-        for contour in contours:   
-
-            # get contour area     
-            area = cv2.contourArea(contour) 
-
-            # filter contour based on min/max area        
-            if area > min_area and area < max_area:
-
-                # update list of correct sized contours                 
-                # filtered_contours.append(contour)
-
-                # draw a circle around the contour (b,g,r)
-                ellipse = cv2.fitEllipse(contour)
-                cv2.ellipse(frame,ellipse,(0,0,255),2)
-
-                # draw the center of the contours 
-                M = cv2.moments(contour)
-                cX = int(M["m10"] / M["m00"])
-                cY = int(M["m01"] / M["m00"])
-                cv2.circle(frame, (cX, cY), 7, (255, 0, 0), -1)
-
-                # show x,y coordinates of center 
-                center_coord_text = "x:{}, y:{}".format(cX,cY)
-                cv2.putText(frame, center_coord_text, (cX - 20, cY - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
-
-                # TAP TILES AND DISPLAY COLOR OVERLAY
-                if toggle==0:
-                    # top left -> play c1
-                    if cX<=mid_x and cY<=mid_y and cY>=offset:
-                        # user pressed top left tile
-                        tap_top_left = True
-                        # red tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (0, offset), (mid_x, mid_y), (0, 0, 255), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                    # top right -> play e1
-                    if cX>mid_x and cY<=mid_y and cY>=offset:
-                        # user pressed top right tile
-                        tap_top_right = True
-                        # blue tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (mid_x, offset), (max_x, mid_y), (255, 0, 0), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                    # bottom left -> play g1
-                    if cX<=mid_x and cY>mid_y:
-                        # user pressed bottom left tile
-                        tap_bottom_left = True
-                        # green tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (0, mid_y), (mid_x, max_y), (0, 255, 0), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                    # bottom right -> play c2
-                    if cX>mid_x and cY>mid_y:
-                        # user pressed bottom right tile
-                        tap_bottom_right = True
-                        # yellow tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (mid_x, mid_y), (max_x, max_y), (0, 255, 255), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                if toggle==1:
-                    # top left -> play c1
-                    if cX<=mid_x and cY<=mid_y and cY>=offset:
-                        # user pressed top left tile
-                        tap_top_left = True
-                        # red tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (0, offset), (mid_x, mid_y), (0, 255, 255), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                    # top right -> play e1
-                    if cX>mid_x and cY<=mid_y and cY>=offset:
-                        # user pressed top right tile
-                        tap_top_right = True
-                        # blue tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (mid_x, offset), (max_x, mid_y), (0, 255, 0), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                    # bottom left -> play g1
-                    if cX<=mid_x and cY>mid_y:
-                        # user pressed bottom left tile
-                        tap_bottom_left = True
-                        # green tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (0, mid_y), (mid_x, max_y), (255, 0, 0), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                    # bottom right -> play c2
-                    if cX>mid_x and cY>mid_y:
-                        # user pressed bottom right tile
-                        tap_bottom_right = True
-                        # yellow tile overlay
-                        overlay = frame.copy()
-                        cv2.rectangle(overlay, (mid_x, mid_y), (max_x, max_y), (0, 0, 255), -1)
-                        cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0, frame)
-                
-                # if user's finger is in the swipe area
-                if cY<offset:
-                    finger_counter += 1
-        
-        # if user has one finger on the pad, keep track of the starting location       
-        if finger_counter == 1 and hold_counter <= 10:
-            # make sure that first the first 5 iterations, the user is on the same side (ie. user is not continuously switching sides)
-            if initial_side_set:
-                if (cX <= mid_x and cY <= offset and initial_swipe_side=='left') or (cX > mid_x and cY <= offset and initial_swipe_side=='right'):
-                    hold_counter += 1
-            # set the initial side the user is swiping from
-            elif not initial_side_set or initial_set_set is None:
-                if cX <= mid_x and cY <= offset:
-                    initial_swipe_side = 'left'
-                    print('INITIAL LEFT')
-                elif cX > mid_x and cY <= offset :
-                    initial_swipe_side = 'right'
-                    print('INITIAL RIGHT')  
-                initial_side_set = True
-                hold_counter += 1
-
-        # if user has more than one finger on the pad at a time      
-        elif finger_counter > 1:
-            # if user has exactly 2 fingers on pad, toggle between sounds
-            if finger_counter == 2:
-                toggle_counter += 1
-                if toggle_counter == 10:
-                    if toggle==1: 
-                        toggle = 0
-                        toggle_counter = 0
-                        print('switch to sound type 0')
-                    elif toggle==0: 
-                        toggle = 1
-                        toggle_counter = 0
-                        print('switch to sound type 1')
-                # reset one finger counter
-                initial_side_set = False
-                initial_swipe_side = None
-                hold_counter = 0
-            # else, reset all counters
-            else:
-                print('RESET')
-                initial_side_set = False
-                initial_swipe_side = None
-                hold_counter = 0
-                toggle_counter = 0
-
-        # if user holds their one finger position long enough, then start considering the swipe
-        if hold_counter > 10:
-            # user swiped from left to right
-            if cX >= mid_x and cY <= offset and initial_swipe_side == 'left':
-                print('left -> right')
-                hold_counter = 0
-                initial_swipe_side = None
-                initial_side_set = False
-                style = 'percussion'
-            # user swiped from right to left
-            elif cX <= mid_x and cY <= offset and initial_swipe_side == 'right':
-                print('right -> left')
-                hold_counter = 0
-                initial_swipe_side = None
-                initial_side_set = False
-                style = 'wind'
-
-        # DEBUGGING STATEMENTS
-        print('toggle_counter:{}'.format(toggle_counter))
-        print('toggle:{}'.format(toggle))
-        print(hold_counter)
-            
-        # draw filtered contours
-        #cv2.drawContours(frame, filtered_contours, -1, (0,255,0), 3)
-
-        # frame, mask, res
-        cv2.imshow("frame", frame)
-        cv2.imshow("mask", mask)
-        cv2.imshow("tracker_window", res)
-
-        # play sound if user pressed respective tile locations
-        if style=='percussion':
-            # piano
-            if toggle==0:
-                if tap_top_left:
-                    piano_c1.play()
-                if tap_top_right:
-                    piano_e1.play()
-                if tap_bottom_left:
-                    piano_g1.play()
-                if tap_bottom_right:
-                    piano_c2.play()
-            # drums
-            if toggle==1:
-                if tap_top_left:
-                    perc_bass_drum.play()
-                if tap_top_right:
-                    perc_cymbal.play()
-                if tap_bottom_left:
-                    perc_tambourine.play()
-                if tap_bottom_right:
-                    perc_woodblock.play()
-
-        elif style=='wind':
-            # trumpet
-            if toggle==0:
-                if tap_top_left:
-                    trumpet_a3.play()
-                if tap_top_right:
-                    trumpet_a4.play()
-                if tap_bottom_left:
-                    trumpet_a5.play()
-                if tap_bottom_right:
-                    trumpet_as3.play()
-            # bass_clarinet
-            if toggle==1:
-                if tap_top_left:
-                    bass_clarinet_a2.play()
-                if tap_top_right:
-                    bass_clarinet_a3.play()
-                if tap_bottom_left:
-                    bass_clarinet_a4.play()
-                if tap_bottom_right:
-                    bass_clarinet_a5.play()
-
-        # reset tap (user let's go)
-        tap_top_left = False
-        tap_top_right = False
-        tap_bottom_left = False
-        tap_bottom_right = False
-
-        # Sets the amount of time to display a frame in milliseconds
-        key = cv2.waitKey(10)
-
-        # quit on escape.
-        if key == 27:
-            break
-
-    cam.release()
-    cv2.destroyAllWindows()
-
-scan()
+    sources = list(source) if isinstance(source, (list, tuple)) else [source]
+    many = len(sources) > 1
+    timings = timings or 'timings.json'
+    startup = startup or StartupTimer()
+
+    # packed, memory mapped samples, shared by every pad
+    library = SampleLibrary(WAV_DIR, audio.sample_rate, audio.channels) if audio is not None else None
+    # notes missing from the recordings, for pitched modes on big grids
+    synth = NoteSynth(library) if library is not None else None
+
+    names = ['pad{}'.format(index + 1) if many else 'multitouch_pad' for index in range(len(sources))]
+    displays = [None] * len(sources)
+    if not headless:
+        displays = [Display(display_fps, views, {'frame': 'frame' + suffix, 'mask': 'mask' + suffix,
+                                                 'res': 'tracker_window' + suffix})
+                    for suffix in [' ' + name if many else '' for name in names]]
+
+    # warm start: the slow parts of startup (opening the cameras, mapping or packing the sample
+    # banks, opening the sound output) wait on devices and the disk rather than the CPU, so they
+    # all run at once on a thread pool while this thread creates the windows (HighGUI has to
+    # stay on the main thread). The capture process opens its own source in multi-process mode.
+    with ThreadPoolExecutor(max_workers=len(sources) + 2, thread_name_prefix='startup') as pool:
+        warming = []
+        opening = [pool.submit(_timed, startup, name + ' source' if many else 'source', open_source, spec)
+                   if isinstance(spec, str) and not processes else None for name, spec in zip(names, sources)]
+        if library is not None:
+            # the starting mode's samples first, they are the first ones played
+            samples = [name for mode in sorted(SAMPLE_FILES, key=lambda mode: mode != ('percussion', 0))
+                       for name in SAMPLE_FILES[mode]]
+            warming.append(pool.submit(_timed, startup, 'samples', library.warm, samples))
+            # one output stream for every pad
+            warming.append(pool.submit(_timed, startup, 'audio', audio.start))
+        if not headless:
+            for display in displays:
+                display.create_windows()
+            startup.mark('windows')
+        # (re-raises whatever went wrong on the pool)
+        sources = [spec if future is None else future.result() for spec, future in zip(sources, opening)]
+        for future in warming:
+            future.result()
+
+    pads = []
+    for name, spec, display in zip(names, sources, displays):
+        root, ext = os.path.splitext(timings)
+        record_root, record_ext = os.path.splitext(record or '')
+        # recorded sources are timed by their own clock (see sources.FrameSource), so a replay
+        # faster than real time still plays the notes the live run did; cameras by the wall clock
+        pads.append(Pad(spec, audio, library, synth, name=name, display=display,
+                        detector=detector, method=method, detect_scale=detect_scale, layout=layout, debounce=debounce,
+                        release=release, motion_gate=motion_gate, motion_threshold=motion_threshold,
+                        profile=profile, calibrate_frames=calibrate_frames,
+                        timings='{}-{}{}'.format(root, name, ext) if many else timings, processes=processes,
+                        output=output, record='{}-{}{}'.format(record_root, name, record_ext) if record and many else record,
+                        target_fps=target_fps, startup=startup, clock=getattr(spec, 'clock', None)))
+    startup.mark('ready')
+    log.info('startup: %s', startup.summary())
+
+    run_pads(pads, headless=headless, max_frames=max_frames, workers=workers)
+
+    if audio is not None:
+        audio.stop()
+        log.info('audio: %s', audio.stats())
+        # (in case it came after the last frame)
+        if audio.first_sound is not None:
+            startup.mark('first sound', audio.first_sound)
+        if synth.rendered:
+            log.info('notes: %s', synth.stats())
+        synth.close()
+
+    if output is not None:
+        output.close()
+        log.info('events: %s', output.stats())
+
+    # how long the station took to come up, up to the first frame and the first note heard
+    log.info('startup: %s', startup.summary())
+
+    # per-stage timings, with the frame to sound latency of each pad's hits (from the frame
+    # the hit was seen in to the first block of its voice)
+    for pad in pads:
+        pad.report()
+
+
+def _timed(startup, milestone, function, *args):
+    '''
+    function(*args), marking milestone in startup once it is done.
+    '''
+    result = function(*args)
+    startup.mark(milestone)
+    return result
+
+
+def main():
+    # startup is timed from here, before the arguments are even parsed
+    startup = StartupTimer()
+    parser = argparse.ArgumentParser(description='Multitouch music tiles')
+    parser.add_argument('--source', action='append',
+                        help='camera[:port], video:<path>, images:<directory> or synthetic[:fingers] '
+                             '(default camera:0); repeat for several pads')
+    parser.add_argument('--headless', action='store_true', help='no windows, process frames as fast as possible')
+    parser.add_argument('--mute', action='store_true', help='do not play sounds')
+    parser.add_argument('--audio', default='device', help='audio output: device[:<name>], null or file:<path.wav>')
+    parser.add_argument('--polyphony', type=int, default=16, help='most samples playing at once')
+    parser.add_argument('--block-size', type=int, default=256, help='audio frames mixed per block')
+    parser.add_argument('--debounce', type=float, default=0.0, help='seconds a tile must be held before it sounds')
+    parser.add_argument('--release', type=float, default=0.1, help='seconds a tile must be empty before its note ends')
+    parser.add_argument('--max-frames', type=int, default=None, help='stop after this many frames')
+    parser.add_argument('--detector', choices=BACKENDS, default='contours', help='blob extraction backend')
+    parser.add_argument('--method', choices=METHODS, default='hsv',
+                        help='finger detection: pad colour, background subtraction or both')
+    parser.add_argument('--detect-scale', type=float, default=1.0,
+                        help='resolution of the finger pad mask relative to the frame (e.g. 0.5)')
+    parser.add_argument('--motion-gate', action='store_true',
+                        help='only re-detect the parts of the pad that changed, skip idle frames')
+    parser.add_argument('--motion-threshold', type=int, default=12,
+                        help='grey level change that counts as motion for --motion-gate')
+    parser.add_argument('--profile', default=PROFILE, help='calibration profile to load (and save with the s key)')
+    parser.add_argument('--calibrate', type=int, default=0, metavar='FRAMES',
+                        help='calibrate the finger pad thresholds on the first FRAMES frames and save the profile')
+    parser.add_argument('--timings', default='timings.json',
+                        help='where to write the stage timings (.json or .csv), on exit and on demand')
+    parser.add_argument('--log-level', default='info', choices=['debug', 'info', 'warning', 'error'],
+                        help='debug also logs the touches every frame')
+    parser.add_argument('--processes', action='store_true',
+                        help='run capture and detection in separate processes (frames in shared memory)')
+    parser.add_argument('--workers', type=int, default=None, help='threads running the pads (default one per pad)')
+    parser.add_argument('--display-fps', type=float, default=30, help='window refresh rate (0 = every frame)')
+    parser.add_argument('--views', default=','.join(VIEWS),
+                        help='windows and debug drawings to compute, from {}'.format(', '.join(VIEWS)))
+    parser.add_argument('--events', default=None, metavar='OUTPUT',
+                        help='also send the note events to osc:[host:]port or midi:<path.mid>')
+    parser.add_argument('--record', default=None, metavar='PATH',
+                        help='log the touches and notes to a session log (replay with session.py render)')
+    parser.add_argument('--target-fps', type=float, default=0,
+                        help='frame rate to pace to, lowering the quality when frames take too long (0 = off)')
+    parser.add_argument('--layout', default='2x2', help='tile grid: {} or RxC, e.g. 4x4'.format(', '.join(LAYOUTS)))
+    args = parser.parse_args()
+
+    sources = args.source or ['camera:0']
+
+    # with several pads every message says which pad it is from
+    logging.basicConfig(level=getattr(logging, args.log_level.upper()),
+                        format='%(name)s: %(message)s' if len(sources) > 1 else '%(message)s')
+    audio = None if args.mute else AudioEngine(open_sink(args.audio), polyphony=args.polyphony, block_size=args.block_size)
+
+    scan(sources, audio=audio, headless=args.headless, max_frames=args.max_frames,
+         detector=args.detector, method=args.method, detect_scale=args.detect_scale, layout=args.layout,
+         debounce=args.debounce, release=args.release, motion_gate=args.motion_gate,
+         motion_threshold=args.motion_threshold, profile=args.profile, calibrate_frames=args.calibrate,
+         timings=args.timings, processes=args.processes, workers=args.workers, display_fps=args.display_fps,
+         views=[view for view in args.views.split(',') if view],
+         output=open_output(args.events) if args.events else None, record=args.record,
+         target_fps=args.target_fps, startup=startup)
+
+
+if __name__ == '__main__':
+    main()
 
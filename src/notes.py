@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Notes the instruments were not recorded at, made by resampling the nearest recorded note.
+# Pitches are MIDI note numbers (C4 = 60); sample names carry their note like trumpet_A3_...,
+# trumpet_As3_... (A sharp 3) or c1s.wav (C sharp 1).
+
+## Import the relevant files
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modes import CHROMATIC, MODES
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+SEMITONES = {'c': 0, 'd': 2, 'e': 4, 'f': 5, 'g': 7, 'a': 9, 'b': 11}
+
+# a note letter, 's' for sharp (before or after the octave) and the octave, between separators
+NOTE_PATTERN = re.compile(r'(?:^|[_-])([a-g])(s?)(\d)(s?)(?=[_.-]|$)', re.IGNORECASE)
+
+
+def parse_note(name):
+    '''
+    MIDI number of the note in a sample or note name ('A3', 'as3', 'c1s.wav', '...'), None if
+    it has none (unpitched samples).
+    '''
+    match = NOTE_PATTERN.search(os.path.splitext(os.path.basename(name))[0])
+    if match is None:
+        return None
+    letter, sharp_before, octave, sharp_after = match.groups()
+    return 12 * (int(octave) + 1) + SEMITONES[letter.lower()] + (1 if sharp_before or sharp_after else 0)
+
+
+def note_name(midi):
+    return '{}{}'.format(NOTE_NAMES[midi % 12], midi // 12 - 1)
+
+
+def chromatic_notes(style, toggle, count):
+    '''
+    The notes of count tiles in a mode: a chromatic scale up from the mode's lowest note when
+    the grid has more tiles than the mode has samples and its instrument is pitched, None when
+    the tiles just play the mode's samples.
+    '''
+    mode = (style, toggle)
+    if mode not in CHROMATIC or count <= len(MODES[mode]['tiles']):
+        return None
+    base = parse_note(CHROMATIC[mode][1])
+    return [base + tile for tile in range(count)]
+
+
+class NoteCache(object):
+    '''
+    Rendered note buffers, least recently used first out once they take more than budget bytes.
+    Thread safe.
+    '''
+
+    def __init__(self, budget=64 << 20):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, key):
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = data
+            self.bytes += data.nbytes
+            while self.bytes > self.budget and len(self.entries) > 1:
+                _, old = self.entries.popitem(last=False)
+                self.bytes -= old.nbytes
+                self.evicted += 1
+
+
+class NoteSynth(object):
+    '''
+    Any note of a pitched instrument from a SampleLibrary. Recorded notes are the library's own
+    buffers; the others are the nearest recorded note resampled by 2 ** (semitones / 12)
+    (a pitch and speed change, fine over the few semitones the recordings are apart), kept in
+    a NoteCache.
+
+    prewarm() renders the notes of a newly selected mode on a background thread pool, so
+    note() on the trigger path is a cache lookup. A note asked for before its render is done
+    is rendered on the spot and counted as a miss.
+    '''
+
+    def __init__(self, library, budget=64 << 20, workers=2):
+        self.library = library
+        self.cache = NoteCache(budget)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='note-synth')
+        # instrument -> sorted recorded MIDI numbers, and their sample names
+        self.recorded = {}
+        self.misses = 0
+        self.rendered = 0
+
+    def _recorded(self, instrument):
+        recorded = self.recorded.get(instrument)
+        if recorded is None:
+            names = {}
+            for name in self.library.bank(instrument).names():
+                midi = parse_note(name)
+                if midi is not None:
+                    names[midi] = '{}/{}'.format(instrument, name)
+            if not names:
+                raise ValueError('{} has no samples with a note in their name'.format(instrument))
+            recorded = self.recorded[instrument] = (np.array(sorted(names)), names)
+        return recorded
+
+    def note(self, instrument, midi):
+        '''
+        int16 (frames, channels) buffer of a note.
+        '''
+        pitches, names = self._recorded(instrument)
+        if midi in names:
+            return self.library.sample(names[midi])
+        data = self.cache.get((instrument, midi))
+        if data is None:
+            self.misses += 1
+            data = self._render(instrument, midi)
+        return data
+
+    def prewarm(self, instrument, notes):
+        '''
+        Render the notes that are not cached yet on the background pool.
+        '''
+        pitches, names = self._recorded(instrument)
+        for midi in notes:
+            if midi not in names and self.cache.get((instrument, midi)) is None:
+                self.pool.submit(self._render, instrument, midi)
+
+    def _render(self, instrument, midi):
+        data = self.cache.get((instrument, midi))
+        if data is not None:
+            return data
+        pitches, names = self._recorded(instrument)
+        source = int(pitches[np.argmin(np.abs(pitches - midi))])
+        recorded = self.library.sample(names[source])
+
+        # playing ratio times faster raises the pitch by (midi - source) semitones
+        ratio = 2 ** ((midi - source) / 12.)
+        frames = max(int(len(recorded) / ratio), 1)
+        positions = np.arange(frames) * ratio
+        index = np.arange(len(recorded))
+        data = np.empty((frames, recorded.shape[1]), np.int16)
+        for channel in range(recorded.shape[1]):
+            data[:, channel] = np.interp(positions, index, recorded[:, channel])
+        self.cache.put((instrument, midi), data)
+        self.rendered += 1
+        return data
+
+    def stats(self):
+        return {'rendered': self.rendered, 'misses': self.misses, 'cached': len(self.cache.entries),
+                'cache_bytes': self.cache.bytes, 'evicted': self.cache.evicted}
+
+    def close(self):
+        self.pool.shutdown(wait=False)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import cv2
+import numpy as np
+
+from modes import MODES, STYLES
+from notes import chromatic_notes, note_name
+
+# transparency for offset/title area
+OFFSET_ALPHA = 0.7
+
+
+class OverlayCache(object):
+    '''
+    Static UI (dividers, title bar, labels and tile outlines) for each (style, toggle) mode,
+    rendered once into a BGR image plus a per-pixel alpha map. Every frame just blends the
+    cached layer over the camera image in one pass. A layer is rebuilt only when the mode,
+    frame size or pad geometry changes.
+    '''
+
+    def __init__(self):
+        # (style, toggle, frame shape, layout) -> (255 * (1 - alpha), alpha * bgr), both uint8
+        self.layers = {}
+        # (tile area shape, colour) -> solid colour patch used to highlight a tapped tile
+        self.fills = {}
+
+    def composite(self, frame, style, toggle, layout):
+        '''
+        Blend the static UI for this mode and tile layout over frame, in place.
+        '''
+        key = (style, toggle, frame.shape, layout.key)
+        layer = self.layers.get(key)
+        if layer is None:
+            layer = self.layers[key] = render_layer(style, toggle, frame.shape, layout)
+        inv_alpha, premultiplied = layer
+        # frame * (1 - alpha) + alpha * bgr, with saturating uint8 arithmetic
+        cv2.multiply(frame, inv_alpha, dst=frame, scale=1/255.)
+        cv2.add(frame, premultiplied, dst=frame)
+        return frame
+
+    def highlight(self, frame, style, toggle, tapped, layout, alpha):
+        '''
+        Blend the colour of every tapped tile over its area, in place. tapped holds the ids of
+        the tapped tiles. Only the tapped tile areas are touched, so the cost does not depend on
+        how many fingers landed in a tile.
+        '''
+        tiles = MODES[(style, toggle)]['tiles']
+        for tile in tapped:
+            label, color = tiles[tile % len(tiles)]
+            x0, y0, x1, y1 = layout.rects[tile]
+            # filled rectangles include their corner points
+            roi = frame[y0:y1+1, x0:x1+1]
+            if roi.size == 0:
+                continue
+            key = (roi.shape, color)
+            fill = self.fills.get(key)
+            if fill is None:
+                fill = self.fills[key] = np.full(roi.shape, color, np.uint8)
+            cv2.addWeighted(fill, alpha, roi, 1 - alpha, 0, dst=roi)
+        return frame
+
+
+def render_layer(style, toggle, shape, layout):
+    '''
+    Draw the static UI for one mode into a transparent layer the size of the frame.
+    Returns (255 * (1 - alpha), alpha * bgr) as 3 channel uint8 images, ready for composite().
+    '''
+    offset, mid_x, max_x, max_y = layout.top, layout.center_x, layout.right, layout.bottom
+    height, width = shape[:2]
+    bgr = np.zeros((height, width, 3), np.float32)
+    alpha = np.zeros((height, width), np.float32)
+
+    scratch = np.zeros((height, width), np.uint8)
+
+    def paint(draw, color, opacity=1.0):
+        # draw the shape into the scratch mask (anti-aliased edges give partial coverage),
+        # then lay its colour over what is already there, only around the shape
+        draw(scratch)
+        x, y, w, h = cv2.boundingRect(scratch)
+        mask = scratch[y:y+h, x:x+w]
+        layer_bgr, layer_alpha = bgr[y:y+h, x:x+w], alpha[y:y+h, x:x+w]
+        hit = mask > 0
+        cover = mask[hit][:, None] * np.float32(opacity / 255.)
+        old_alpha = layer_alpha[hit][:, None]
+        new_alpha = cover + old_alpha * (1 - cover)
+        layer_bgr[hit] = (cover * np.float32(color) + old_alpha * (1 - cover) * layer_bgr[hit]) / new_alpha
+        layer_alpha[hit] = new_alpha[:, 0]
+        mask[:] = 0
+
+    def text(label, org, scale, color, thickness):
+        paint(lambda m: cv2.putText(m, label, org, cv2.FONT_HERSHEY_SIMPLEX, scale, 255, thickness), color)
+
+    # dividing lines
+    paint(lambda m: cv2.line(m, (0, offset), (max_x, offset), 255, 5), (0, 0, 0))      # offset divider
+    for x in layout.xs[1:-1]:
+        paint(lambda m: cv2.line(m, (x, offset), (x, max_y), 255, 5), (0, 0, 0))       # vertical dividers
+    for y in layout.ys[1:-1]:
+        paint(lambda m: cv2.line(m, (0, y), (max_x, y), 255, 5), (0, 0, 0))            # horizontal dividers
+
+    # title bar and swipe hint for this style
+    paint(lambda m: cv2.rectangle(m, (0, 0), (max_x, offset), 255, -1), STYLES[style]['bar_color'], OFFSET_ALPHA)
+    hint, hint_side, hint_color = STYLES[style]['hint']
+    text(hint, (10 if hint_side == 'left' else mid_x + 50, 20), 0.5, hint_color, 2)
+
+    # text for the sound type
+    mode = MODES[(style, toggle)]
+    title, title_offset = mode['title']
+    text(title, (mid_x - title_offset, int(offset/2)+10), 1, (255, 255, 255), 3)
+
+    # text for each key in the middle of its tile (smaller on dense grids) or where the layout
+    # puts it, then the coloured tile outlines; grids with more tiles than the mode has keys
+    # repeat the key colours, and are labelled with their chromatic notes (or repeat the keys
+    # of unpitched modes)
+    x0, y0, x1, y1 = layout.rects[0]
+    scale = min(1.0, min(x1 - x0, y1 - y0) / 120.)
+    thickness = max(1, int(round(3 * scale)))
+    notes = chromatic_notes(style, toggle, len(layout))
+    for tile, (x0, y0, x1, y1) in enumerate(layout.rects):
+        label, color = mode['tiles'][tile % len(mode['tiles'])]
+        if notes is not None:
+            label = note_name(notes[tile])
+        if layout.labels is not None:
+            text(label, layout.labels[tile], scale, color, thickness)
+            continue
+        (w, h), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+        text(label, ((x0 + x1 - w) // 2, (y0 + y1 + h) // 2), scale, color, thickness)
+    for tile, (x0, y0, x1, y1) in enumerate(layout.rects):
+        label, color = mode['tiles'][tile % len(mode['tiles'])]
+        paint(lambda m: cv2.rectangle(m, (x0, y0), (x1, y1), 255, 3), color)
+
+    alpha = alpha[:, :, None]
+    return np.rint(255 * (1 - alpha)).repeat(3, axis=2).astype(np.uint8), np.rint(alpha * bgr).astype(np.uint8)
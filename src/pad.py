@@ -0,0 +1,628 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import logging
+import signal
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import cv2
+import numpy as np
+
+from buffers import FrameBuffers
+from calibration import PROFILE, Thresholds, calibrate_source, load_profile, save_profile
+from capture import FrameGrabber
+from detection import open_detector
+from event_output import OutputEvent, instrument_event, sample_note, velocity
+from events import TouchEventFilter
+from instrumentation import StageTimer
+from layout import get_layout
+from modes import CHROMATIC, SAMPLE_FILES
+from motion import MotionGate, cover_blobs, overlaps
+from multiproc import ProcessPipeline
+from notes import chromatic_notes
+from overlay import OverlayCache
+from scheduler import LEVELS, FrameScheduler
+from session import SessionRecorder
+from sources import open_source
+from tracking import GestureRecognizer, TouchTracker
+
+
+class Pad(object):
+    '''
+    One music pad: its frame source, calibration, tile layout, instrument samples and play
+    state (sound mode, touch tracks, held notes). Everything a pad owns lives on the instance,
+    so one process can run several of them; the sample library, note synth and audio engine
+    are passed in and can be shared.
+
+    step() processes one frame and show() puts the latest drawn one on screen; they can run on
+    different threads (show() must stay on the main thread, where HighGUI lives). Frames are
+    only drawn (overlay, debug views) when the display (a display.Display, None when
+    headless) is due for a refresh, so detection runs as fast as it can whatever the display
+    rate.
+
+    source is a frame source or a source spec like 'camera:0'. samples maps each (style,
+    toggle) mode to the sample of every tile (modes.SAMPLE_FILES by default); on grids with
+    more tiles, pitched modes play a chromatic scale from the synth (a notes.NoteSynth) instead,
+    pre-rendered whenever the mode is selected. output (an event_output sink, shared by the
+    pads) also gets every frame's note-on/note-off and instrument change events as one batch,
+    for a synth outside this process. record is the path of a session log (see session.py) to
+    write the detections, note events and mode changes to.
+
+    target_fps paces the pad with a scheduler.FrameScheduler: pace() sleeps out the rest of
+    each frame period and set_quality() applies the quality level it picks (debug views off,
+    then half resolution detection unless the detection method learns a background model,
+    then no static overlay). See multitouch_pad.scan() for the other options.
+
+    profile is the calibration profile file the finger pad thresholds are loaded from (and
+    saved to), or the thresholds themselves: a calibration dict or a calibration.Thresholds.
+
+    clock gives the time the touch tracking, note timing and session log go by
+    (time.perf_counter by default); a recorded or generated source can pass its own, for runs
+    that come out the same at any speed. startup (an instrumentation.StartupTimer) gets the
+    time of the first frame and of the first sound, which are also logged as they happen.
+    '''
+
+    def __init__(self, source, audio=None, library=None, synth=None, name='pad', display=None,
+                 detector='contours', method='hsv', detect_scale=1.0, layout='2x2', debounce=0.0, release=0.1,
+                 motion_gate=False, motion_threshold=12, profile=PROFILE, calibrate_frames=0, timings=None,
+                 processes=False, samples=SAMPLE_FILES, output=None, record=None, target_fps=0, clock=None,
+                 startup=None):
+        self.name = name
+        self.log = logging.getLogger(name)
+        self.clock = clock or time.perf_counter
+        self.wall_clock = clock is None
+        self.audio = audio
+        self.library = library
+        self.synth = synth
+        self.samples = samples
+        self.display = display
+        # the profile file the thresholds are saved to (None when they were passed in)
+        self.profile = profile if isinstance(profile, str) else None
+
+        # note events for the event output: the ones waiting for the next frame's batch, and
+        # the note every sounding tile started, so its note-off matches after a mode change
+        self.output = output
+        self.output_events = []
+        self.sounding = {}
+        self.timings = timings or 'timings.json'
+
+        # starting sound style
+        self.style = 'percussion'
+        self.toggle = 0     # toggle between sound types: Percussion: Piano <-> Drums, Wind: Trumpet <-> Bass Clarinet
+
+        # overlay transparency
+        self.alpha = 0.35       # transparency for tiles
+
+        # tile grid, with the swipe area on the top
+        self.layout = layout = get_layout(layout)
+        # the session log starts with the pad's tiles and samples, then the starting mode
+        self.recorder = SessionRecorder(record, name, len(layout), samples, clock) if record else None
+        self.select_mode(self.style, self.toggle)
+        offset = layout.top             # leave swipe area on the top
+        mid_x = layout.center_x         # splits the swipe area into left and right
+        max_x = layout.right            # max boundary for x
+        max_y = layout.bottom           # max boundary for y
+
+        # the capture process opens the source itself in multi-process mode
+        spec = source
+        if isinstance(source, str) and not processes:
+            source = open_source(source)
+        self.source = source
+
+        # finger pad thresholds: calibrated on the first frames if asked to (and saved, if the
+        # profile is a file), else the ones given or saved in the profile
+        if calibrate_frames:
+            sample_source = open_source(spec) if processes else source
+            profile = calibrate_source(sample_source, calibrate_frames, roi=(0, 0, max_x, max_y))
+            if processes:
+                sample_source.release()
+            if self.profile is not None:
+                save_profile(profile, self.profile)
+            self.log.info('calibrated %s', self.profile or 'the thresholds')
+        if isinstance(profile, Thresholds):
+            self.thresholds = profile
+        else:
+            self.thresholds = Thresholds(load_profile(profile) if isinstance(profile, str) else profile)
+        self.thresholds_version = self.thresholds.version
+
+        # per-stage timings of the frame loop
+        self.timer = StageTimer()
+        self.dump_requested = False
+        # frame to sound latencies of this pad's hits, appended by the audio thread and moved
+        # into the timer before the timings are written
+        self.sound_latencies = deque(maxlen=1000)
+
+        # finds finger pads, only inside the pad area
+        self.detector = open_detector(method, detector, scale=detect_scale, roi=(0, 0, max_x, max_y), timer=self.timer)
+
+        # skips the detection while the pad is idle (None = detect every frame); background
+        # models have to see every frame
+        if motion_gate and processes:
+            self.log.warning('the motion gate is not used in multi-process mode')
+        if motion_gate and not self.detector.regions:
+            self.log.warning('the motion gate is not used with the %s detection method', method)
+        self.gate = None
+        if motion_gate and not processes and self.detector.regions:
+            self.gate = MotionGate((0, 0, max_x, max_y), motion_threshold)
+        self.blobs = []
+
+        # pre-rendered static UI for each (style, toggle) mode, and the debug view images
+        self.overlay_cache = OverlayCache()
+        self.buffers = FrameBuffers()
+
+        # follows every finger across frames, and spots swipes and two-finger holds in the swipe area
+        self.tracker = TouchTracker()
+        self.gestures = GestureRecognizer(offset, mid_x)
+
+        # turns tile occupancy into note-on/note-off events
+        self.touch_events = TouchEventFilter(debounce, release)
+
+        # capture and detection in their own processes, frames passed through shared memory
+        self.pipeline = None
+        if processes:
+            self.pipeline = ProcessPipeline(spec, detector, detect_scale, self.detector.roi, method=method,
+                                            ellipses=display is not None and 'blobs' in display.views)
+        self.grabber = None
+
+        # frame pacing and quality levels (None = as fast as possible, always full quality)
+        self.detect_scale = detect_scale
+        self.scheduler = FrameScheduler(target_fps, log=self.log) if target_fps else None
+        self.set_quality(0)
+
+        self.frame_count = 0
+        self.start_time = None
+        self.startup = startup
+        self.waiting_for_sound = startup is not None and audio is not None
+
+    def select_mode(self, style, toggle):
+        '''
+        Switch the sound mode. On grids that play a chromatic scale its notes are rendered in
+        the background right away, so they are ready before the first tap.
+        '''
+        self.style, self.toggle = style, toggle
+        self.notes = chromatic_notes(style, toggle, len(self.layout))
+        if self.notes is not None and self.synth is not None:
+            self.synth.prewarm(CHROMATIC[(style, toggle)][0], self.notes)
+        if self.output is not None:
+            # the instrument is the sample directory of the mode
+            self.output_events.append(instrument_event(self.samples[(style, toggle)][0].split('/')[0]))
+        if self.recorder is not None:
+            self.recorder.mode(style, toggle)
+
+    def tile_note(self, tile):
+        '''
+        MIDI note a tile plays in the current mode.
+        '''
+        if self.notes is not None:
+            return self.notes[tile]
+        names = self.samples[(self.style, self.toggle)]
+        return sample_note(names[tile % len(names)])
+
+    def set_quality(self, level):
+        '''
+        Draw and detect at a scheduler quality level (an index into scheduler.LEVELS).
+        '''
+        self.quality = level
+        views = self.display.views if self.display is not None else set()
+        # the debug views go first, only the frame itself stays
+        self.views = views if level < LEVELS.index('no_debug') else views & {'frame'}
+        # then the detection resolution (the detection process keeps its own; so do background
+        # models, which would relearn the pad at a new size and lose the fingers held on it)
+        if self.pipeline is None and self.detector.rescales:
+            self.detector.set_scale(self.detect_scale / 2 if level >= LEVELS.index('low_res') else self.detect_scale)
+        # and finally the static overlay with its text
+        self.static_overlay = level < LEVELS.index('no_text')
+
+    def pace(self):
+        '''
+        End of a frame (drawn and shown): wait for the next one and adapt the quality, when
+        pacing to a target frame rate.
+        '''
+        if self.scheduler is None:
+            return
+        level = self.scheduler.end()
+        if level != self.quality:
+            self.set_quality(level)
+
+    def create_windows(self):
+        '''
+        Create the tracker window and its trackbars, which update the thresholds when they move.
+        Main thread only.
+        '''
+        window = self.display.windows['res']
+        cv2.namedWindow(window, 0)
+        self.thresholds.create_trackbars(window)
+
+    def start(self):
+        if self.pipeline is not None:
+            self.pipeline.start(self.thresholds)
+        elif self.source.live:
+            # read live cameras on their own thread so we always process the newest frame,
+            # recorded sources are read directly so no frame is skipped
+            self.grabber = FrameGrabber(self.source).start()
+        self.start_time = time.perf_counter()
+        return self
+
+    def step(self):
+        '''
+        Process the next frame. Returns False once the source has no more frames (a live camera
+        that is only slow to deliver one returns True, having processed nothing).
+        '''
+        timer = self.timer
+        layout = self.layout
+
+        # Grabs the newest frame (older ones are dropped by the capture thread), and when it
+        # was taken, for the frame to sound latency
+        timer.start()
+        if self.pipeline is not None:
+            # newest frame the detection process is done with, and its blobs (the frame itself
+            # stays in shared memory until it is drawn, see below)
+            number, stamp, self.blobs = self.pipeline.read()
+            ok = number is not None
+            frame = None
+        elif self.grabber is not None:
+            _, stamp, frame = self.grabber.read_stamped()
+            if frame is None and self.grabber.running:
+                # no frame for a second, but the camera is still there (warming up, stalled):
+                # the loop goes on (keys, stop requests) and the next step waits again
+                self.log.warning('no frame from the camera for 1 s, still waiting')
+                if self.scheduler is not None:
+                    self.scheduler.begin()
+                return True
+            ok = frame is not None
+        else:
+            ok, frame = self.source.read()
+            stamp = time.perf_counter()
+        if not ok:
+            return False
+        # when the frame happened on the pad's clock: the capture stamp on the wall clock, the
+        # source's own time for recorded sources (so what is logged or sent of a replay matches
+        # the recording, whatever speed it ran at)
+        moment = stamp if self.wall_clock else self.clock()
+        self.frame_count += 1
+        if self.frame_count == 1 and self.startup is not None:
+            self.startup.mark('first frame')
+            self.log.info('first frame after %.3fs', time.perf_counter() - self.startup.origin)
+        if self.waiting_for_sound and self.audio.first_sound is not None:
+            # the engine played its first voice (whichever pad hit it): logged once, by the
+            # first pad to see it
+            self.waiting_for_sound = False
+            if self.startup.mark('first sound', self.audio.first_sound):
+                self.log.info('first sound after %.3fs', self.startup.get('first sound'))
+        timer.lap('capture')
+        if self.scheduler is not None:
+            self.scheduler.begin()
+
+        # draw this frame only if the display refreshes now; blob outlines only if they are shown
+        render = self.display is not None and self.display.due()
+        outlines = render and 'blobs' in self.views
+
+        # in multi-process mode only a frame that gets drawn is copied out of the ring, into one
+        # of two buffers (the main thread can still be showing the other); the rest of the step
+        # only needs the frame shape
+        if self.pipeline is not None:
+            shape = self.pipeline.shape
+            if render:
+                buffer = self.buffers.get(('frame', self.display.published % 2), shape)
+                frame = self.pipeline.frame(number, buffer)
+                # (overwritten before it was copied: drawn on the next frame instead)
+                render = frame is not None
+                outlines = render and 'blobs' in self.views
+        else:
+            shape = frame.shape
+
+        # hsv bounds and area limits, as last set by the trackbars (or the profile)
+        thresholds = self.thresholds
+        lower_hsv, upper_hsv = thresholds.lower, thresholds.upper
+        min_area, max_area = thresholds.min_area, thresholds.max_area
+
+        # new thresholds invalidate the touches found with the old ones
+        if thresholds.version != self.thresholds_version:
+            self.thresholds_version = thresholds.version
+            if self.gate is not None:
+                self.gate.reset()
+            if self.pipeline is not None:
+                self.pipeline.set_thresholds(thresholds)
+
+        # finger pads with an area between min/max area (ellipses only when they are drawn),
+        # found on the hsv mask of the pad area at detection resolution (in multi-process mode
+        # the detection process already did this)
+        detector = self.detector
+        if self.pipeline is None and self.gate is None:
+            self.blobs = detector.find(frame, lower_hsv, upper_hsv, min_area, max_area, fit_ellipses=outlines)
+        elif self.gate is not None:
+            # only where the pad changed; an idle pad keeps the last frame's touches
+            regions = cover_blobs(self.gate.check(frame), self.blobs)
+            timer.lap('motion')
+            if regions and not detector.refines(frame):
+                # the kept mask is gone (new detection scale or frame size): one full pass
+                # replaces every touch, merging it with the old ones would count them twice
+                self.blobs = detector.find(frame, lower_hsv, upper_hsv, min_area, max_area, fit_ellipses=outlines)
+            elif regions:
+                blobs = [blob for blob in self.blobs if not any(overlaps(blob.bbox, region) for region in regions)]
+                for region in regions:
+                    blobs += detector.find(frame, lower_hsv, upper_hsv, min_area, max_area, fit_ellipses=outlines,
+                                           region=region)
+                self.blobs = blobs
+        blobs = self.blobs
+
+        # TAP TILES: tile under every finger, in one lookup (-1 is the swipe area)
+        tile_ids = layout.lookup([blob.x for blob in blobs], [blob.y for blob in blobs], shape)
+        tapped = np.unique(tile_ids[tile_ids >= 0])
+        timer.lap('hit_test')
+
+        # overlay and debug views, for the frames that get shown
+        if render:
+            self.render(frame, blobs, tapped)
+            timer.lap('overlay')
+
+        # SWIPE / TOGGLE: follow the fingers, then look for gestures in the swipe area
+        self.tracker.update([(blob.x, blob.y) for blob in blobs], self.clock())
+        for gesture in self.gestures.update(self.tracker.tracks):
+            # user swiped from left to right
+            if gesture == 'swipe_right':
+                self.log.info('left -> right')
+                self.select_mode('percussion', self.toggle)
+            # user swiped from right to left
+            elif gesture == 'swipe_left':
+                self.log.info('right -> left')
+                self.select_mode('wind', self.toggle)
+            # user held two fingers in the swipe area, toggle between sounds
+            elif gesture == 'toggle':
+                self.select_mode(self.style, 1 - self.toggle)
+                self.log.info('switch to sound type %d', self.toggle)
+
+        # DEBUGGING STATEMENTS (only formatted when debug logging is on)
+        if self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug('touches:%d toggle:%d', len(self.tracker.active()), self.toggle)
+        timer.lap('gestures')
+
+        # note-on/note-off for the tiles the user pressed or let go of
+        events = self.touch_events.update(tapped, self.clock())
+
+        # play sound when the user presses a tile (a held tile does not retrigger)
+        if self.audio is not None:
+            names = self.samples[(self.style, self.toggle)]
+            for event in events:
+                if event.kind != 'on':
+                    continue
+                if self.notes is not None and self.synth is not None:
+                    data = self.synth.note(CHROMATIC[(self.style, self.toggle)][0], self.notes[event.tile])
+                else:
+                    data = self.library.sample(names[event.tile % len(names)])
+                self.audio.trigger(data, origin=stamp, latencies=self.sound_latencies)
+
+        # the same events, batched into one message for the event output
+        if self.output is not None:
+            self.send_events(events, blobs, tile_ids, moment)
+
+        # and the frame's touches with them, for the session log
+        if self.recorder is not None:
+            self.recorder.frame(moment, self.frame_count, blobs, events)
+        timer.lap('audio')
+        timer.end()
+
+        if self.dump_requested:
+            self.dump_requested = False
+            self.collect_latencies()
+            self.timer.dump(self.timings)
+            self.log.info('wrote %s', self.timings)
+        return True
+
+    def send_events(self, events, blobs, tile_ids, stamp):
+        '''
+        Send this frame's note events, and any instrument change, to the event output as one
+        batch, stamped with the frame's time on the pad's clock (so a MIDI file written from a
+        replay is timed like the recording). A note-on's velocity comes from the biggest blob
+        on its tile.
+        '''
+        batch, self.output_events = self.output_events, []
+        thresholds = self.thresholds
+        for event in events:
+            if event.kind == 'on':
+                note = self.sounding[event.tile] = self.tile_note(event.tile)
+                area = max(blob.area for blob, tile in zip(blobs, tile_ids) if tile == event.tile)
+                batch.append(OutputEvent('on', event.tile, note, velocity(area, thresholds.min_area, thresholds.max_area), None))
+            else:
+                batch.append(OutputEvent('off', event.tile, self.sounding.pop(event.tile, self.tile_note(event.tile)), 0, None))
+        if batch:
+            self.output.send(self.name, batch, stamp)
+
+    def render(self, frame, blobs, tapped):
+        '''
+        Draw the overlay and the enabled debug views for frame and publish them to the display.
+        '''
+        display = self.display
+        views = self.views
+        style, toggle, layout = self.style, self.toggle, self.layout
+        images = {}
+
+        # mask image at full size, before the UI is drawn over the frame; the debug images
+        # alternate between two sets of buffers, so the main thread can still be showing the
+        # last ones while these are drawn
+        if 'mask' in views or 'res' in views:
+            parity = display.published % 2
+            mask = self.detector.display_mask(frame.shape, out=self.buffers.get(('mask', parity), frame.shape[:2]))
+            if 'mask' in views:
+                images['mask'] = mask
+            if 'res' in views:
+                # (masked out pixels are left alone, so clear what the buffer held before)
+                res = self.buffers.get(('res', parity), frame.shape)
+                res.fill(0)
+                images['res'] = cv2.bitwise_and(frame,frame, dst=res, mask= mask)
+
+        # dividers, title bar, labels and tile outlines for the current mode (rendered once,
+        # cached), unless the scheduler dropped them
+        if self.static_overlay:
+            self.overlay_cache.composite(frame, style, toggle, layout)
+
+        if 'blobs' in views:
+            for blob in blobs:
+
+                # center of the blob
+                cX, cY = blob.x, blob.y
+
+                # draw a circle around the blob (b,g,r)
+                if blob.ellipse is not None:
+                    cv2.ellipse(frame,blob.ellipse,(0,0,255),2)
+
+                # draw the center of the blob
+                cv2.circle(frame, (cX, cY), 7, (255, 0, 0), -1)
+
+                # show x,y coordinates of center
+                center_coord_text = "x:{}, y:{}".format(cX,cY)
+                cv2.putText(frame, center_coord_text, (cX - 20, cY - 20), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 0, 0), 2)
+
+        # colour overlay for the tapped tiles, blended in one pass limited to the tile areas
+        self.overlay_cache.highlight(frame, style, toggle, tapped, layout, self.alpha)
+        if 'frame' in views:
+            images['frame'] = frame
+        display.publish(images)
+
+    def show(self):
+        '''
+        Put the latest drawn frame on screen, if there is a new one. Main thread only. Returns
+        whether anything was shown.
+        '''
+        started = time.perf_counter()
+        if not self.display.show():
+            return False
+        self.timer.record('imshow', time.perf_counter() - started)
+        return True
+
+    def run(self, max_frames=None, stop=None):
+        '''
+        step() until the source ends, max_frames frames are done or stop (a threading.Event) is set.
+        '''
+        while (max_frames is None or self.frame_count < max_frames) and not (stop is not None and stop.is_set()):
+            if not self.step():
+                break
+            self.pace()
+
+    def save_thresholds(self):
+        if self.profile is None:
+            self.log.warning('no profile file to save the thresholds to')
+            return
+        self.thresholds.save(self.profile)
+        self.log.info('saved %s', self.profile)
+
+    def stop(self):
+        '''
+        Release the source and log the frame counters and stage timings.
+        '''
+        # throughput, and captured/processed/dropped frame counters for live sources
+        elapsed = time.perf_counter() - self.start_time
+        self.log.info('processed %d frames in %.2fs (%.1f fps)', self.frame_count, elapsed,
+                      self.frame_count / max(elapsed, 1e-9))
+        if self.gate is not None:
+            self.log.info('motion gate: %s', self.gate.stats())
+        if self.scheduler is not None:
+            self.log.info('scheduler: %s', self.scheduler.stats())
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.log.info('frames: %s', self.pipeline.stats())
+        elif self.grabber is not None:
+            self.log.info('frames: %s', self.grabber.stats())
+            self.grabber.stop()
+        else:
+            self.source.release()
+        if self.recorder is not None:
+            self.recorder.close()
+            self.log.info('recorded %s: %s', self.recorder.path, self.recorder.stats())
+
+    def collect_latencies(self):
+        '''
+        Move the frame to sound latencies the audio thread measured since the last call into
+        the timer, as the 'frame_to_sound' stage.
+        '''
+        latencies = self.sound_latencies
+        while latencies:
+            self.timer.record('frame_to_sound', latencies.popleft())
+
+    def report(self):
+        '''
+        Log the stage timings and write them to the timings file.
+        '''
+        self.collect_latencies()
+        self.log.info('stage timings:\n%s', self.timer.summary())
+        self.timer.dump(self.timings)
+
+
+def run_pads(pads, headless=False, max_frames=None, workers=None):
+    '''
+    Run pads until their sources end, max_frames frames each are done or ESC is pressed.
+
+    A single pad runs on this thread. Several pads each run their frame loop on a thread pool
+    of workers threads (one per pad by default); OpenCV and NumPy release the GIL for the pixel
+    work, so the pads use several cores. This thread keeps HighGUI: it shows the latest drawn
+    frame of every pad and handles the keys (ESC quits, s saves the profiles, t writes the
+    timings). Keys are read with a 1 ms waitKey after every refresh, never with a fixed wait
+    per detected frame. SIGUSR1 also writes the timings.
+    '''
+    if hasattr(signal, 'SIGUSR1'):
+        def request_dump(signum, stack):
+            for pad in pads:
+                pad.dump_requested = True
+        signal.signal(signal.SIGUSR1, request_dump)
+
+    if not headless:
+        for pad in pads:
+            pad.create_windows()
+    for pad in pads:
+        pad.start()
+
+    if len(pads) == 1:
+        pad = pads[0]
+        while max_frames is None or pad.frame_count < max_frames:
+            if not pad.step():
+                break
+            # detection goes as fast as the frames come in (or the target rate allows), the
+            # windows refresh at the display rate
+            if not headless and pad.show() and not _handle_key(pads):
+                break
+            pad.pace()
+    else:
+        stop = threading.Event()
+        with ThreadPoolExecutor(max_workers=workers or len(pads), thread_name_prefix='pad') as pool:
+            futures = [pool.submit(pad.run, max_frames, stop) for pad in pads]
+            while not all(future.done() for future in futures):
+                if headless:
+                    wait(futures, timeout=0.1)
+                    continue
+                for pad in pads:
+                    pad.show()
+                # (the 1 ms key wait paces this loop)
+                if not _handle_key(pads):
+                    stop.set()
+            for future in futures:
+                # re-raise anything that went wrong in a pad
+                future.result()
+
+    for pad in pads:
+        pad.stop()
+    if not headless:
+        cv2.destroyAllWindows()
+
+
+def _handle_key(pads):
+    # lets HighGUI process its events (and draw the windows); 1 ms, the display is throttled elsewhere
+    key = cv2.waitKey(1)
+
+    # quit on escape.
+    if key == 27:
+        return False
+
+    # save the trackbar thresholds as the calibration profile
+    if key == ord('s'):
+        for pad in pads:
+            pad.save_thresholds()
+
+    # write the stage timings so far
+    if key == ord('t'):
+        for pad in pads:
+            pad.dump_requested = True
+    return True
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Packs the WAV files of an instrument directory into one sample bank file.
+# To run: python3 samplebank.py wav/piano [wav/piano.bank]
+#
+# Bank layout (little endian):
+#   header  magic 'MTSB', version u16, count u16, sample rate u32, channels u16, reserved u16
+#   index   count x (name length u16, name utf-8, byte offset u64, frames u32)
+#   pcm     int16 interleaved frames of every sample, each starting on a 16 byte boundary
+
+## Import the relevant files
+import argparse
+import glob
+import mmap
+import os
+import struct
+import tempfile
+import threading
+
+import numpy as np
+
+from audio import CHANNELS, SAMPLE_RATE, load_wave
+
+MAGIC = b'MTSB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIHH')
+ENTRY = struct.Struct('<QI')
+ALIGN = 16
+
+
+def pack_bank(directory, path=None, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+    '''
+    Decode every WAV file in directory (converted to the engine's rate and channel count)
+    and write them into one bank file, <directory>.bank by default. Returns the bank path.
+    '''
+    path = path or directory.rstrip(os.sep) + '.bank'
+    names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(directory, '*.wav')))
+    if not names:
+        raise IOError('no WAV files found in {}'.format(directory))
+    samples = [load_wave(os.path.join(directory, name), sample_rate, channels) for name in names]
+
+    # the index is written first, so work out where each sample's PCM will land
+    encoded = [name.encode('utf-8') for name in names]
+    offset = HEADER.size + sum(2 + len(name) + ENTRY.size for name in encoded)
+    offsets = []
+    for data in samples:
+        offset += -offset % ALIGN
+        offsets.append(offset)
+        offset += data.nbytes
+
+    # write to a temporary file and rename, so a running pad never maps a half written bank;
+    # the temporary file is unique, so processes packing the same bank never share one
+    handle, tmp = tempfile.mkstemp(suffix='.tmp', prefix=os.path.basename(path) + '.',
+                                   dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(handle, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, VERSION, len(names), sample_rate, channels, 0))
+            for name, offset, data in zip(encoded, offsets, samples):
+                out.write(struct.pack('<H', len(name)) + name + ENTRY.pack(offset, len(data)))
+            for offset, data in zip(offsets, samples):
+                out.write(b'\0' * (offset - out.tell()))
+                out.write(np.ascontiguousarray(data, '<i2').tobytes())
+        # (mkstemp makes it private to us, a bank is for everyone to read)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    return path
+
+
+class SampleBank(object):
+    '''
+    A packed bank, memory mapped. Samples are handed out as zero-copy int16 (frames, channels)
+    views into the mapping, so opening a bank costs no decoding and the OS only pages in the
+    notes that actually get played.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, self.sample_rate, self.channels, _ = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise IOError('{} is not a version {} sample bank'.format(path, VERSION))
+
+        # name -> (byte offset, frames)
+        self.index = {}
+        pos = HEADER.size
+        for _ in range(count):
+            length, = struct.unpack_from('<H', self.map, pos)
+            name = self.map[pos + 2:pos + 2 + length].decode('utf-8')
+            pos += 2 + length
+            self.index[name] = ENTRY.unpack_from(self.map, pos)
+            pos += ENTRY.size
+
+    def names(self):
+        return sorted(self.index)
+
+    def get(self, name):
+        '''
+        Zero-copy view of one sample.
+        '''
+        offset, frames = self.index[name]
+        return np.frombuffer(self.map, np.int16, frames * self.channels, offset).reshape(frames, self.channels)
+
+
+class SampleLibrary(object):
+    '''
+    All instruments under a directory of <instrument>/<note>.wav files, loaded lazily: the
+    first sample asked for from an instrument maps its bank (packing it first if the bank is
+    missing or older than the WAV files). Startup cost and resident memory no longer grow
+    with the size of the library. Several pads can share one library from their own threads.
+    '''
+
+    def __init__(self, root, sample_rate=SAMPLE_RATE, channels=CHANNELS):
+        self.root = root
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+        # instrument -> SampleBank, and 'instrument/note.wav' -> sample view
+        self.banks = {}
+        self.samples = {}
+        # so two pads never pack or map the same bank at once
+        self.lock = threading.Lock()
+
+    def sample(self, name):
+        '''
+        Sample buffer for 'instrument/note.wav'.
+        '''
+        data = self.samples.get(name)
+        if data is None:
+            instrument, note = name.split('/', 1)
+            data = self.samples[name] = self.bank(instrument).get(note)
+        return data
+
+    def warm(self, names):
+        '''
+        Map (and pack, if needed) the banks of the samples named 'instrument/note.wav' ahead of
+        their first tap, in the order given, so the first hits do not wait for the disk.
+        '''
+        for name in names:
+            self.sample(name)
+
+    def bank(self, instrument):
+        '''
+        The (mapped) bank of an instrument.
+        '''
+        bank = self.banks.get(instrument)
+        if bank is None:
+            with self.lock:
+                return self._map(instrument)
+        return bank
+
+    def _map(self, instrument):
+        bank = self.banks.get(instrument)
+        if bank is None:
+            directory = os.path.join(self.root, instrument)
+            path = directory + '.bank'
+            if self._stale(directory, path):
+                pack_bank(directory, path, self.sample_rate, self.channels)
+            bank = self.banks[instrument] = SampleBank(path)
+            if (bank.sample_rate, bank.channels) != (self.sample_rate, self.channels):
+                # packed for another engine format, repack it for ours
+                pack_bank(directory, path, self.sample_rate, self.channels)
+                bank = self.banks[instrument] = SampleBank(path)
+        return bank
+
+    def _stale(self, directory, path):
+        if not os.path.exists(path):
+            return True
+        built = os.path.getmtime(path)
+        return any(os.path.getmtime(wav) > built for wav in glob.glob(os.path.join(directory, '*.wav')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pack an instrument directory of WAV files into a sample bank')
+    parser.add_argument('directory', help='e.g. wav/piano')
+    parser.add_argument('bank', nargs='?', help='output file, <directory>.bank by default')
+    args = parser.parse_args()
+
+    path = pack_bank(args.directory, args.bank)
+    bank = SampleBank(path)
+    print('{}: {} samples, {} bytes'.format(path, len(bank.index), os.path.getsize(path)))
+
+
+if __name__ == '__main__':
+    main()
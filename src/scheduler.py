@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import logging
+import time
+
+# quality levels, best first: everything; no debug views (mask and masked windows, blob
+# outlines and coordinates); detection at half resolution on top of that; and no static
+# overlay (title bar, hint and tile labels) either, only the tapped tile highlights
+LEVELS = ('full', 'no_debug', 'low_res', 'no_text')
+
+
+class FrameScheduler(object):
+    '''
+    Paces a frame loop to a target rate and trades drawing and detection quality for time
+    when frames cost more than the budget (1 / fps seconds).
+
+    begin() marks the start of a frame's work (after the frame was captured, so waiting for
+    the camera does not count), end() its end: it measures the work, sleeps away whatever is
+    left of the frame period (nothing if the frame was late or the camera already made us
+    wait) and returns the quality level (an index into LEVELS) the next frame should use.
+
+    The cost is smoothed over about smoothing frames. Above the budget the level drops one
+    step (at most once every settle frames, so each step gets to show its effect); once the
+    cost stays below headroom * budget for patience frames it climbs back one step. Every
+    change is logged.
+    '''
+
+    def __init__(self, fps, levels=LEVELS, headroom=0.6, smoothing=10, settle=10, patience=60, log=None):
+        self.budget = 1. / fps
+        self.levels = levels
+        self.headroom = headroom
+        self.rate = 1. / smoothing
+        self.settle = settle
+        self.patience = patience
+        self.log = log or logging.getLogger('scheduler')
+
+        self.level = 0
+        self.cost = None
+        self.since_change = 0
+        self.calm = 0
+        self.period_start = self.work_start = time.perf_counter()
+
+        self.frames = 0
+        self.late = 0
+        self.slept = 0.
+        self.changes = 0
+
+    def begin(self):
+        self.work_start = time.perf_counter()
+
+    def end(self):
+        now = time.perf_counter()
+        cost = now - self.work_start
+        self.cost = cost if self.cost is None else self.cost + self.rate * (cost - self.cost)
+        self.frames += 1
+        self.since_change += 1
+
+        # slower than the budget: step down, when the last step had time to take effect
+        if self.cost > self.budget:
+            self.calm = 0
+            if self.level < len(self.levels) - 1 and self.since_change >= self.settle:
+                self._change(self.level + 1)
+        # comfortably faster for long enough: step back up
+        elif self.cost < self.headroom * self.budget:
+            self.calm += 1
+            if self.level > 0 and self.calm >= self.patience:
+                self._change(self.level - 1)
+        else:
+            self.calm = 0
+
+        # sleep out the rest of the frame period, never to catch up on late frames
+        delay = self.budget - (now - self.period_start)
+        if delay > 0:
+            time.sleep(delay)
+            self.slept += delay
+        else:
+            self.late += 1
+        self.period_start = time.perf_counter()
+        return self.level
+
+    def _change(self, level):
+        self.log.info('quality %s -> %s (frame %.1f ms, budget %.1f ms)', self.levels[self.level], self.levels[level],
+                      self.cost * 1000, self.budget * 1000)
+        self.level = level
+        self.since_change = 0
+        self.calm = 0
+        self.changes += 1
+
+    def stats(self):
+        return {'level': self.levels[self.level], 'changes': self.changes, 'late': self.late, 'frames': self.frames,
+                'slept_s': round(self.slept, 2)}
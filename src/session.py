@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Session logs: what a pad saw and played, frame by frame, small enough to keep instead of
+# the video, and an offline renderer that bounces a log to a WAV file much faster than real
+# time.
+# To run: python3 session.py render session.mtp [more.mtp ...] [--out DIR] [--workers N]
+#         python3 session.py info session.mtp
+#
+# Log layout (little endian), records only ever appended, so a log cut short by a crash
+# still reads up to its last whole record:
+#   header  magic 'MTSL', version u16, JSON length u32, JSON (pad name, tile count, samples)
+#   record  type u8, stamp f64 (seconds since the session started), then by type
+#     'F' frame   frame number u32, blob count u16, count x (x i16, y i16, area f32)
+#     'N' note    kind u8 (1 on, 0 off), tile u16
+#     'M' mode    toggle u8, style length u8, style utf-8
+
+## Import the relevant files
+import argparse
+import json
+import multiprocessing as mp
+import os
+import struct
+import time
+import wave
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from audio import CHANNELS, SAMPLE_RATE
+from modes import CHROMATIC, SAMPLE_FILES, WAV_DIR
+from notes import NoteSynth, chromatic_notes
+from samplebank import SampleLibrary
+
+MAGIC = b'MTSL'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+RECORD = struct.Struct('<cd')
+FRAME = struct.Struct('<IH')
+BLOB = np.dtype([('x', '<i2'), ('y', '<i2'), ('area', '<f4')])
+NOTE = struct.Struct('<BH')
+MODE = struct.Struct('<BB')
+
+# blobs is a structured array with x, y and area fields
+FrameRecord = namedtuple('FrameRecord', ['stamp', 'number', 'blobs'])
+NoteRecord = namedtuple('NoteRecord', ['stamp', 'kind', 'tile'])
+ModeRecord = namedtuple('ModeRecord', ['stamp', 'style', 'toggle'])
+
+
+class SessionRecorder(object):
+    '''
+    Appends a pad's detections, note events and mode changes to a session log. One recorder
+    per pad: it is only written from the pad's own thread.
+
+    Stamps are times on the pad's clock. By default that is perf_counter, stored relative to
+    when the recorder was opened; a recorded source's clock (see sources.FrameSource) is
+    stored as it is, seconds since the start of the recording, so the log of a replay has the
+    timing of the recording however fast it was replayed.
+    '''
+
+    def __init__(self, path, pad='pad', tiles=4, samples=SAMPLE_FILES, clock=None):
+        self.path = path
+        self.clock = clock or time.perf_counter
+        self.start = time.perf_counter() if clock is None else 0.
+        self.out = open(path, 'wb', buffering=1 << 16)
+        info = json.dumps({'pad': pad, 'tiles': tiles,
+                           'samples': {'{},{}'.format(*mode): names for mode, names in samples.items()}}).encode('utf-8')
+        self.out.write(HEADER.pack(MAGIC, VERSION, len(info)) + info)
+        self.frames = 0
+        self.notes = 0
+
+    def frame(self, stamp, number, blobs, events=()):
+        '''
+        Log one frame's blobs and the note events it caused. stamp is when the frame was
+        taken, on the recorder's clock.
+        '''
+        stamp = max(stamp - self.start, 0.)
+        packed = np.array([(blob.x, blob.y, blob.area) for blob in blobs], BLOB)
+        parts = [RECORD.pack(b'F', stamp), FRAME.pack(number, len(packed)), packed.tobytes()]
+        for event in events:
+            parts.append(RECORD.pack(b'N', stamp) + NOTE.pack(event.kind == 'on', event.tile))
+        self.out.write(b''.join(parts))
+        self.frames += 1
+        self.notes += len(events)
+
+    def mode(self, style, toggle, stamp=None):
+        # (a source clock is just before 0 until the first frame is read)
+        stamp = max((self.clock() if stamp is None else stamp) - self.start, 0.)
+        name = style.encode('utf-8')
+        self.out.write(RECORD.pack(b'M', stamp) + MODE.pack(toggle, len(name)) + name)
+
+    def stats(self):
+        return {'frames': self.frames, 'notes': self.notes}
+
+    def close(self):
+        self.out.close()
+
+
+class SessionReader(object):
+    '''
+    Reads a session log back: info (the header) and records(), the Frame/Note/ModeRecords in
+    the order they were logged.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        magic, version, size = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} session log'.format(path, VERSION))
+        self.info = json.loads(self.data[HEADER.size:HEADER.size + size].decode('utf-8'))
+        self.offset = HEADER.size + size
+
+    def samples(self):
+        '''
+        The sample table the pad played, keyed by (style, toggle).
+        '''
+        samples = {}
+        for key, names in self.info['samples'].items():
+            style, toggle = key.split(',')
+            samples[(style, int(toggle))] = names
+        return samples
+
+    def records(self):
+        data = self.data
+        pos = self.offset
+        try:
+            while pos < len(data):
+                kind, stamp = RECORD.unpack_from(data, pos)
+                pos += RECORD.size
+                if kind == b'F':
+                    number, count = FRAME.unpack_from(data, pos)
+                    pos += FRAME.size
+                    end = pos + count * BLOB.itemsize
+                    if end > len(data):
+                        return
+                    blobs = np.frombuffer(data, BLOB, count, pos)
+                    pos = end
+                    yield FrameRecord(stamp, number, blobs)
+                elif kind == b'N':
+                    on, tile = NOTE.unpack_from(data, pos)
+                    pos += NOTE.size
+                    yield NoteRecord(stamp, 'on' if on else 'off', tile)
+                elif kind == b'M':
+                    toggle, size = MODE.unpack_from(data, pos)
+                    pos += MODE.size
+                    style = data[pos:pos + size].decode('utf-8')
+                    pos += size
+                    yield ModeRecord(stamp, style, toggle)
+                else:
+                    raise ValueError('{}: unknown record {!r} at byte {}'.format(self.path, kind, pos - RECORD.size))
+        except struct.error:
+            # the log was cut short in the middle of a record
+            return
+
+
+def session_notes(reader):
+    '''
+    [(stamp, sound)] of every note-on in a session, sound being ('sample', name) for the
+    tiles that play a recorded sample and ('note', instrument, midi) for chromatic tiles,
+    resolved the way the pad did: by the mode at the time and the pad's tile count.
+    '''
+    samples = reader.samples()
+    tiles = reader.info['tiles']
+    mode = notes = None
+    played = []
+    for record in reader.records():
+        if isinstance(record, ModeRecord):
+            mode = (record.style, record.toggle)
+            notes = chromatic_notes(record.style, record.toggle, tiles)
+        elif isinstance(record, NoteRecord) and record.kind == 'on' and mode is not None:
+            if notes is not None:
+                played.append((record.stamp, ('note', CHROMATIC[mode][0], notes[record.tile])))
+            else:
+                names = samples[mode]
+                played.append((record.stamp, ('sample', names[record.tile % len(names)])))
+    return played
+
+
+def mix(starts, buffers, channels=CHANNELS, polyphony=16):
+    '''
+    Mix int16 (frames, channels) buffers starting at the given frame offsets into one float32
+    track in [-1, 1]. Like the live engine, at most polyphony voices play at once and a new
+    voice beyond that cuts the oldest one off.
+    '''
+    starts = np.asarray(starts, np.int64)
+    lengths = np.array([len(data) for data in buffers], np.int64)
+    ends = starts + lengths
+
+    # where every voice stops: at its end, or when a later voice steals it
+    order = np.argsort(starts, kind='stable')
+    playing = []
+    for index in order:
+        # voices still playing when this one starts, oldest first
+        playing = [voice for voice in playing if ends[voice] > starts[index]]
+        if len(playing) >= polyphony:
+            ends[playing.pop(0)] = starts[index]
+        playing.append(index)
+
+    out = np.zeros((int(ends.max()) if len(ends) else 0, channels), np.float32)
+    scale = np.float32(1 / 32768.)
+    for start, end, data in zip(starts, ends, buffers):
+        out[start:end] += data[:end - start] * scale
+    np.clip(out, -1, 1, out=out)
+    return out
+
+
+def render_session(path, out=None, sample_rate=SAMPLE_RATE, channels=CHANNELS, polyphony=16, library=None):
+    '''
+    Bounce a session log to a 16 bit WAV file (the log's name with .wav by default), playing
+    each note-on at the exact time of its frame. Returns (wav path, seconds of audio, seconds
+    it took to render).
+    '''
+    started = time.perf_counter()
+    out = out or os.path.splitext(path)[0] + '.wav'
+    library = library or SampleLibrary(WAV_DIR, sample_rate, channels)
+    synth = None
+
+    starts, buffers = [], []
+    for stamp, sound in session_notes(SessionReader(path)):
+        if sound[0] == 'sample':
+            data = library.sample(sound[1])
+        else:
+            # one synth for the whole bounce, rendering on this thread
+            synth = synth or NoteSynth(library, workers=1)
+            data = synth.note(sound[1], sound[2])
+        starts.append(int(round(stamp * sample_rate)))
+        buffers.append(data)
+    if synth is not None:
+        synth.close()
+
+    track = mix(starts, buffers, channels, polyphony)
+    with wave.open(out, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes((track * 32767).astype(np.int16).tobytes())
+    return out, len(track) / float(sample_rate), time.perf_counter() - started
+
+
+def render_sessions(paths, out_dir=None, workers=None, **options):
+    '''
+    Bounce several session logs in parallel, one process each (workers at a time). Returns
+    render_session()'s result for every log, in order.
+    '''
+    outs = [os.path.join(out_dir, os.path.splitext(os.path.basename(path))[0] + '.wav') if out_dir else None
+            for path in paths]
+    if len(paths) == 1:
+        return [render_session(paths[0], outs[0], **options)]
+    # pack whatever bank is missing or stale here, once: workers packing the same bank at once
+    # would write over each other
+    library = SampleLibrary(WAV_DIR, options.get('sample_rate', SAMPLE_RATE), options.get('channels', CHANNELS))
+    instruments = set()
+    for path in paths:
+        for mode, names in SessionReader(path).samples().items():
+            instruments.update(name.split('/', 1)[0] for name in names)
+            if mode in CHROMATIC:
+                instruments.add(CHROMATIC[mode][0])
+    for instrument in sorted(instruments):
+        library.bank(instrument)
+    # spawn, like the multi-process pad: the workers map the sample banks themselves
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as pool:
+        futures = [pool.submit(render_session, path, out, **options) for path, out in zip(paths, outs)]
+        return [future.result() for future in futures]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Session logs of the multitouch pad')
+    commands = parser.add_subparsers(dest='command', required=True)
+    render = commands.add_parser('render', help='bounce session logs to WAV files')
+    render.add_argument('paths', nargs='+')
+    render.add_argument('--out', default=None, help='directory for the WAV files (default next to the logs)')
+    render.add_argument('--workers', type=int, default=None, help='logs rendered at once (default one per core)')
+    render.add_argument('--polyphony', type=int, default=16, help='most samples playing at once')
+    info = commands.add_parser('info', help='summarize a session log')
+    info.add_argument('paths', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        for path in args.paths:
+            reader = SessionReader(path)
+            frames = notes = 0
+            last = 0.
+            for record in reader.records():
+                frames += isinstance(record, FrameRecord)
+                notes += isinstance(record, NoteRecord) and record.kind == 'on'
+                last = record.stamp
+            print('{}: pad {}, {} frames, {} notes, {:.1f}s'.format(path, reader.info['pad'], frames, notes, last))
+        return
+
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+    for out, seconds, took in render_sessions(args.paths, args.out, args.workers, polyphony=args.polyphony):
+        print('{}: {:.1f}s of audio in {:.2f}s ({:.0f}x real time)'.format(out, seconds, took, seconds / max(took, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
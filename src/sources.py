@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+import glob
+import math
+import os
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# colour of the finger pads (inside the default HSV calibration), used by the synthetic source
+PAD_HSV = (86, 180, 200)
+
+# a scripted finger: on the pad for frames start to end - 1, moving in a straight line from
+# begin (x, y) to finish (x, y) (the same point for a tap), radius pixels big
+Stroke = namedtuple('Stroke', ['start', 'end', 'begin', 'finish', 'radius'])
+
+
+class FrameSource(object):
+    '''
+    Something that produces frames. Works like cv2.VideoCapture: read() returns (ok, frame)
+    and release() frees it. live sources (cameras) keep producing frames whether or not we
+    read them, so they are read through a FrameGrabber; recorded sources are read directly
+    so every frame gets processed.
+
+    Recorded sources also have a clock(): the time of the last frame read, in seconds of the
+    recording. A pad that goes by it times touches and notes the same at any replay speed
+    (None for live sources, which go by the wall clock).
+    '''
+    live = False
+    clock = None
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class CameraSource(FrameSource):
+    '''
+    Frames from a camera port.
+    '''
+    live = True
+
+    def __init__(self, port=0):
+        self.cam = cv2.VideoCapture(port)
+        if not self.cam.isOpened():
+            raise IOError('could not open camera {}'.format(port))
+
+    def read(self):
+        return self.cam.read()
+
+    def release(self):
+        self.cam.release()
+
+
+class VideoFileSource(FrameSource):
+    '''
+    Frames from a recorded video file, optionally looping forever. The clock is the
+    timestamp of the frame in the file, and keeps counting up across the rewinds.
+    '''
+
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.cam = cv2.VideoCapture(path)
+        if not self.cam.isOpened():
+            raise IOError('could not open video {}'.format(path))
+        self.period = 1. / (self.cam.get(cv2.CAP_PROP_FPS) or 30)
+        # timestamp of the last frame read, and the length of the loops already played
+        self.position = 0.
+        self.offset = 0.
+
+    def read(self):
+        ok, frame = self.cam.read()
+        # rewind at the end of the file
+        if not ok and self.loop:
+            self.offset += self.position + self.period
+            self.cam.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cam.read()
+        if ok:
+            self.position = self.cam.get(cv2.CAP_PROP_POS_MSEC) / 1000.
+        return ok, frame
+
+    def clock(self):
+        return self.offset + self.position
+
+    def release(self):
+        self.cam.release()
+
+
+class ImageDirectorySource(FrameSource):
+    '''
+    Frames from the images in a directory, in file name order, taken fps times a second
+    (for the clock).
+    '''
+
+    def __init__(self, directory, loop=False, extensions=('png', 'jpg', 'jpeg', 'bmp'), fps=30):
+        self.paths = sorted(path for ext in extensions for path in glob.glob(os.path.join(directory, '*.' + ext)))
+        if not self.paths:
+            raise IOError('no images found in {}'.format(directory))
+        self.loop = loop
+        self.fps = fps
+        self.index = 0
+        # frames read, across the loops
+        self.count = 0
+
+    def read(self):
+        if self.index >= len(self.paths):
+            if not self.loop:
+                return False, None
+            self.index = 0
+        frame = cv2.imread(self.paths[self.index])
+        self.index += 1
+        self.count += 1
+        return frame is not None, frame
+
+    def clock(self):
+        return (self.count - 1) / float(self.fps)
+
+
+class SyntheticSource(FrameSource):
+    '''
+    Generated frames: a dark, noisy background with finger pad coloured blobs moving over it.
+    Needs no hardware or recordings, so the pipeline can run anywhere.
+
+    fingertips(index) is the ground truth of a frame: where every finger is drawn and how big.
+    The source plays at a nominal fps: clock() is the time of the last frame read, so a pad
+    run with it as its clock sees the same timing however fast it processes the frames.
+    '''
+
+    def __init__(self, fingers=2, frames=None, size=(640, 480), radius=45, noise=8, seed=0, fps=30):
+        self.fingers = fingers
+        self.frames = frames
+        self.fps = fps
+        self.width, self.height = size
+        self.radius = radius
+        self.noise = noise
+        self.rng = np.random.RandomState(seed)
+        self.index = 0
+
+        # BGR colour of the finger pads
+        self.color = tuple(int(c) for c in cv2.cvtColor(np.uint8([[PAD_HSV]]), cv2.COLOR_HSV2BGR)[0, 0])
+        self.background = np.full((self.height, self.width, 3), 40, np.uint8)
+
+        # a few sensor noise patterns, generated once and cycled so noise costs one add per frame
+        self.noise_frames = [self.rng.randint(-noise, noise + 1, self.background.shape).astype(np.int16)
+                             for _ in range(8)] if noise else []
+
+    def positions(self, index):
+        '''
+        Centre of every finger at the given frame index. Each finger follows its own slow
+        Lissajous path over the pad.
+        '''
+        points = []
+        for finger in range(self.fingers):
+            t = index / 60. + finger * 2.1
+            x = self.width / 2. + (self.width / 2. - self.radius) * math.sin(t * (1 + 0.3 * finger))
+            y = self.height / 2. + (self.height / 2. - self.radius) * math.sin(t * 0.7 + finger)
+            points.append((int(x), int(y)))
+        return points
+
+    def fingertips(self, index):
+        '''
+        (x, y, radius) of every finger at the given frame index.
+        '''
+        return [(x, y, self.radius) for x, y in self.positions(index)]
+
+    def clock(self):
+        return (self.index - 1) / float(self.fps)
+
+    def read(self):
+        if self.frames is not None and self.index >= self.frames:
+            return False, None
+        frame = self.background.copy()
+        for x, y, radius in self.fingertips(self.index):
+            cv2.circle(frame, (x, y), radius, self.color, -1)
+        if self.noise_frames:
+            frame = cv2.add(frame, self.noise_frames[self.index % len(self.noise_frames)], dtype=cv2.CV_8U)
+        self.index += 1
+        return True, frame
+
+
+class ScriptedSource(SyntheticSource):
+    '''
+    Synthetic frames of scripted fingers (Strokes) instead of the endless Lissajous paths:
+    taps, drags and swipes at known places, sizes and times, for checking what the pipeline
+    makes of them. Ends after the last stroke unless frames says otherwise.
+    '''
+
+    def __init__(self, strokes, frames=None, size=(640, 480), noise=8, seed=0, fps=30):
+        strokes = [Stroke(*stroke) for stroke in strokes]
+        frames = frames if frames is not None else max(stroke.end for stroke in strokes)
+        SyntheticSource.__init__(self, len(strokes), frames, size, 0, noise, seed, fps)
+        self.strokes = strokes
+
+    def fingertips(self, index):
+        tips = []
+        for start, end, (x0, y0), (x1, y1), radius in self.strokes:
+            if start <= index < end:
+                # fraction of the way from begin to finish
+                t = (index - start) / float(max(end - start - 1, 1))
+                tips.append((int(round(x0 + (x1 - x0) * t)), int(round(y0 + (y1 - y0) * t)), radius))
+        return tips
+
+    def positions(self, index):
+        return [(x, y) for x, y, radius in self.fingertips(index)]
+
+
+def open_source(spec):
+    '''
+    Open a frame source from a command line spec:
+    camera[:port], video:<path>, images:<directory> or synthetic[:fingers].
+    '''
+    kind, _, arg = spec.partition(':')
+    if kind == 'camera':
+        return CameraSource(int(arg or 0))
+    if kind == 'video':
+        return VideoFileSource(arg)
+    if kind == 'images':
+        return ImageDirectorySource(arg)
+    if kind == 'synthetic':
+        return SyntheticSource(fingers=int(arg or 2))
+    raise ValueError('unknown frame source {!r}'.format(spec))
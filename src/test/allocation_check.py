@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Checks that the steady-state frame loop allocates no large arrays: runs a pad (detection,
+# hit-test, gestures and every debug view drawn on every frame) over frames that are already
+# in memory, and measures with tracemalloc the most memory each frame had allocated at once
+# on top of what it started with. Exits with status 1 if any frame went over --limit KB, the
+# signature of a full-size image allocated per frame (a 640x480 mask alone is 300 KB).
+# To run (from src/): python3 test/allocation_check.py [--scale 0.5] [--backend components]
+
+## Import the relevant files
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from calibration import DEFAULT_CALIBRATION
+from display import Display
+from pad import Pad
+from sources import FrameSource, SyntheticSource
+
+
+class ReplaySource(FrameSource):
+    '''
+    Cycles through frames generated up front, copied into one reused buffer, so reading a
+    frame allocates nothing and the measurement only sees the pad.
+    '''
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.out = np.empty_like(frames[0])
+        self.index = 0
+
+    def read(self):
+        np.copyto(self.out, self.frames[self.index % len(self.frames)])
+        self.index += 1
+        return True, self.out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure per-frame allocations of the frame loop')
+    parser.add_argument('--frames', type=int, default=300, help='measured frames')
+    parser.add_argument('--warmup', type=int, default=60, help='frames before measuring (buffers, caches)')
+    parser.add_argument('--fingers', type=int, default=3)
+    parser.add_argument('--scale', type=float, default=1.0, help='detection scale')
+    parser.add_argument('--backend', default='contours', help='blob extraction backend')
+    parser.add_argument('--method', default='hsv', help='finger detection method')
+    parser.add_argument('--motion-gate', action='store_true')
+    parser.add_argument('--limit', type=float, default=64, help='KB a frame may allocate at once')
+    args = parser.parse_args()
+
+    source = SyntheticSource(fingers=args.fingers, frames=120)
+    frames = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            break
+        frames.append(frame)
+
+    # a display refreshing every frame draws the overlay and every debug view each time
+    pad = Pad(ReplaySource(frames), name='allocations', display=Display(fps=0), detector=args.backend,
+              method=args.method, detect_scale=args.scale, motion_gate=args.motion_gate,
+              profile=DEFAULT_CALIBRATION).start()
+
+    collections = [0]
+    gc.callbacks.append(lambda phase, info: collections.__setitem__(0, collections[0] + (phase == 'start')))
+
+    tracemalloc.start()
+    for _ in range(args.warmup):
+        pad.step()
+    buffers = pad.detector.buffers.allocated + pad.buffers.allocated
+    collections[0] = 0
+
+    peaks = []
+    start = tracemalloc.get_traced_memory()[0]
+    for _ in range(args.frames):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        pad.step()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    growth = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    reallocated = pad.detector.buffers.allocated + pad.buffers.allocated - buffers
+
+    peaks = np.array(peaks) / 1024.
+    print('per frame peak allocation: p50 {:.1f} KB  p99 {:.1f} KB  max {:.1f} KB'.format(
+        np.percentile(peaks, 50), np.percentile(peaks, 99), peaks.max()))
+    print('memory growth over {} frames: {:.1f} KB'.format(args.frames, growth / 1024.))
+    print('garbage collections: {}, buffers reallocated: {}, working buffers: {:.0f} KB'.format(
+        collections[0], reallocated, (pad.detector.buffers.nbytes() + pad.buffers.nbytes()) / 1024.))
+
+    over = int((peaks > args.limit).sum())
+    if over or reallocated:
+        print('FAIL: {} frames allocated more than {} KB at once, {} buffers reallocated'.format(
+            over, args.limit, reallocated))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
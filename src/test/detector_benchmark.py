@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compares the blob extraction backends of detection.py on the same masks.
+# To run (from src/): python3 test/detector_benchmark.py [--frames 300] [--clutter 400]
+
+## Import the relevant files
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from detection import BACKENDS, FingerDetector
+from sources import SyntheticSource
+
+# default calibration for detecting finger pads
+lower_hsv = np.array([71, 113, 0])
+upper_hsv = np.array([101, 255, 255])
+min_area, max_area = 3175, 12344
+
+
+def make_masks(frames, fingers, clutter, seed=0):
+    '''
+    Finger pad masks for synthetic frames, with clutter small specks and holes sprinkled in
+    (the kind of noise a cluttered, badly lit frame produces).
+    '''
+    rng = np.random.RandomState(seed)
+    source = SyntheticSource(fingers=fingers, frames=frames, seed=seed)
+    masks = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            break
+        mask = cv2.inRange(cv2.cvtColor(frame, cv2.COLOR_BGR2HSV), lower_hsv, upper_hsv)
+        for _ in range(clutter):
+            x, y = rng.randint(0, mask.shape[1]), rng.randint(0, mask.shape[0])
+            cv2.circle(mask, (x, y), int(rng.randint(1, 4)), int(rng.choice([0, 255])), -1)
+        masks.append(mask)
+    return masks
+
+
+def run(backend, masks, fit_ellipses):
+    detector = FingerDetector(backend)
+    found = 0
+    start = time.perf_counter()
+    for mask in masks:
+        found += len(detector.detect(mask, min_area, max_area, fit_ellipses=fit_ellipses))
+    elapsed = time.perf_counter() - start
+    return elapsed / len(masks) * 1000, found / float(len(masks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the blob extraction backends')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--fingers', type=int, default=4)
+    parser.add_argument('--clutter', type=int, nargs='+', default=[0, 400, 2000], help='specks per frame')
+    args = parser.parse_args()
+
+    print('{:>8} {:>12} {:>9} {:>10} {:>12}'.format('clutter', 'backend', 'ellipses', 'ms/frame', 'blobs/frame'))
+    for clutter in args.clutter:
+        masks = make_masks(args.frames, args.fingers, clutter)
+        for backend in BACKENDS:
+            for fit_ellipses in (False, True):
+                ms, blobs = run(backend, masks, fit_ellipses)
+                print('{:>8} {:>12} {:>9} {:>10.3f} {:>12.2f}'.format(clutter, backend, str(fit_ellipses), ms, blobs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Compares the finger detection methods of detection.py (see detection.METHODS) on the same
+# clips: per-frame cost, and precision/recall against where the fingers really are.
+# To run (from src/): python3 test/method_benchmark.py [--frames 300] [--scale 0.5]
+#                     python3 test/method_benchmark.py --clip video:venue.avi (cost and blob counts only)
+#
+# The generated clips are synthetic pads (known finger positions) under conditions a venue
+# throws at the detector: a clean pad, a pad coloured sticker on the pad, and the lights
+# slowly dimming.
+
+## Import the relevant files
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from calibration import DEFAULT_CALIBRATION, Thresholds
+from detection import METHODS, open_detector
+from sources import SyntheticSource, open_source
+
+CONDITIONS = ('clean', 'sticker', 'dimming')
+
+
+def make_clip(condition, frames, fingers, seed=0):
+    '''
+    (frames, true finger centres per frame, finger radius) for a synthetic clip.
+    '''
+    source = SyntheticSource(fingers=fingers, frames=frames, seed=seed)
+    clip, truth = [], []
+    for index in range(frames):
+        truth.append(source.positions(index))
+        ok, frame = source.read()
+        if condition == 'sticker':
+            # a finger sized patch of pad colour that never moves
+            cv2.circle(frame, (90, 400), source.radius, source.color, -1)
+        elif condition == 'dimming':
+            # the lights go down to 60% over the clip
+            frame = cv2.convertScaleAbs(frame, alpha=1 - 0.4 * index / frames)
+        clip.append(frame)
+    return clip, truth, source.radius
+
+
+def score(blobs, points, radius):
+    '''
+    (true positives, false positives, false negatives) of one frame: a blob is a hit if its
+    centre lies within radius of a finger no other blob has claimed.
+    '''
+    free = list(points)
+    hits = 0
+    for blob in blobs:
+        if not free:
+            break
+        distances = [np.hypot(blob.x - x, blob.y - y) for x, y in free]
+        nearest = int(np.argmin(distances))
+        if distances[nearest] <= radius:
+            free.pop(nearest)
+            hits += 1
+    return hits, len(blobs) - hits, len(free)
+
+
+def run(method, clip, truth, radius, thresholds, backend, scale, warmup):
+    detector = open_detector(method, backend, scale=scale)
+    hits = false_positives = misses = 0
+    found = 0
+    start = time.perf_counter()
+    timed = 0
+    for index, frame in enumerate(clip):
+        if index == warmup:
+            # background models get a few frames to learn the pad before we count
+            start = time.perf_counter()
+        blobs = detector.find(frame, thresholds.lower, thresholds.upper, thresholds.min_area, thresholds.max_area)
+        if index < warmup:
+            continue
+        timed += 1
+        found += len(blobs)
+        if truth is not None:
+            tp, fp, fn = score(blobs, truth[index], radius)
+            hits += tp
+            false_positives += fp
+            misses += fn
+    ms = (time.perf_counter() - start) / max(timed, 1) * 1000
+    precision = hits / float(max(hits + false_positives, 1))
+    recall = hits / float(max(hits + misses, 1))
+    return ms, found / float(max(timed, 1)), precision, recall
+
+
+def read_clip(spec, frames):
+    source = open_source(spec)
+    clip = []
+    while len(clip) < frames:
+        ok, frame = source.read()
+        if not ok:
+            break
+        clip.append(frame)
+    source.release()
+    return clip
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the finger detection methods')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--fingers', type=int, default=3)
+    parser.add_argument('--warmup', type=int, default=30, help='frames not counted at the start of every clip')
+    parser.add_argument('--scale', type=float, default=1.0, help='detection scale')
+    parser.add_argument('--backend', default='components', help='blob extraction backend')
+    parser.add_argument('--clip', action='append', help='a recorded clip (source spec) instead of the synthetic ones')
+    args = parser.parse_args()
+
+    thresholds = Thresholds(DEFAULT_CALIBRATION)
+    if args.clip:
+        clips = [(spec, read_clip(spec, args.frames), None, 0) for spec in args.clip]
+    else:
+        clips = [(condition,) + make_clip(condition, args.frames, args.fingers) for condition in CONDITIONS]
+
+    print('{:>22} {:>11} {:>10} {:>12} {:>10} {:>8}'.format('clip', 'method', 'ms/frame', 'blobs/frame', 'precision',
+                                                           'recall'))
+    for name, clip, truth, radius in clips:
+        for method in METHODS:
+            ms, blobs, precision, recall = run(method, clip, truth, radius, thresholds, args.backend, args.scale,
+                                               args.warmup)
+            if truth is None:
+                print('{:>22} {:>11} {:>10.3f} {:>12.2f} {:>10} {:>8}'.format(name, method, ms, blobs, '-', '-'))
+            else:
+                print('{:>22} {:>11} {:>10.3f} {:>12.2f} {:>10.3f} {:>8.3f}'.format(name, method, ms, blobs, precision,
+                                                                                    recall))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Runs the real pad pipeline (masking, blob extraction, hit-test, touch tracking, gestures and
+# note events) on generated frames whose finger positions are known, and checks it against a
+# stored baseline: exits with status 1 if the frame rate or the detection accuracy regressed.
+# To run (from src/): python3 test/pipeline_regression.py
+#                     python3 test/pipeline_regression.py --update   (record a new baseline)
+# Frame rates depend on the machine: record the baseline on the machine that checks it.
+
+## Import the relevant files
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from calibration import DEFAULT_CALIBRATION
+from pad import Pad
+from sources import ScriptedSource, SyntheticSource
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_baseline.json')
+
+# tile centres of the 2x2 pad (640 px wide frames), and the two halves of the swipe area
+TILES = [(162, 195), (482, 195), (162, 382), (482, 382)]
+LEFT, RIGHT = (150, 50), (500, 50)
+
+
+def scenarios():
+    '''
+    name -> (source factory, note-ons expected per frame that has any, mode changes expected),
+    None where a scenario checks only detection.
+    '''
+    taps = []
+    for tile, centre in enumerate(TILES):
+        taps.append((20 * tile, 20 * tile + 12, centre, centre, 45))
+    # a two finger chord on the last frames
+    taps += [(80, 92, TILES[0], TILES[0], 45), (80, 92, TILES[3], TILES[3], 45)]
+
+    gestures = [
+        # swipe left: hold on the right half, then cross over
+        (0, 15, RIGHT, RIGHT, 45), (15, 25, RIGHT, LEFT, 45),
+        # swipe right
+        (40, 55, LEFT, LEFT, 45), (55, 65, LEFT, RIGHT, 45),
+        # two fingers held: toggle the sound type
+        (80, 100, LEFT, LEFT, 45), (80, 100, RIGHT, RIGHT, 45),
+    ]
+
+    return {
+        'lissajous': (lambda: SyntheticSource(fingers=3, frames=300, seed=1), None, None),
+        'small_noisy': (lambda: SyntheticSource(fingers=4, frames=150, radius=36, noise=16, seed=2), None, None),
+        'taps': (lambda: ScriptedSource(taps, frames=100), [[0], [1], [2], [3], [0, 3]], None),
+        'gestures': (lambda: ScriptedSource(gestures, frames=110), None,
+                     [['wind', 0], ['percussion', 0], ['percussion', 1]]),
+    }
+
+
+class EventCollector(object):
+    '''
+    Event output (see event_output.py) that keeps the tiles of every frame's note-ons.
+    '''
+
+    def __init__(self):
+        self.chords = []
+
+    def send(self, pad, events, stamp=None):
+        tiles = sorted(event.tile for event in events if event.kind == 'on')
+        if tiles:
+            self.chords.append(tiles)
+
+    def close(self):
+        pass
+
+
+def run_scenario(factory, method, backend, scale):
+    source = factory()
+    events = EventCollector()
+    # the default thresholds, not whatever profile was last calibrated here
+    pad = Pad(source, name='regression', detector=backend, method=method, detect_scale=scale,
+              profile=DEFAULT_CALIBRATION, output=events, clock=source.clock).start()
+
+    hits = false_positives = misses = 0
+    right_tiles = 0
+    errors = []
+    modes = []
+    mode = (pad.style, pad.toggle)
+    steps = []
+    while True:
+        started = time.perf_counter()
+        if not pad.step():
+            break
+        steps.append(time.perf_counter() - started)
+
+        # match every blob to the nearest unclaimed finger within its radius
+        tips = list(source.fingertips(source.index - 1))
+        for blob in pad.blobs:
+            if not tips:
+                false_positives += 1
+                continue
+            distances = [np.hypot(blob.x - x, blob.y - y) for x, y, radius in tips]
+            nearest = int(np.argmin(distances))
+            x, y, radius = tips[nearest]
+            if distances[nearest] > radius:
+                false_positives += 1
+                continue
+            tips.pop(nearest)
+            hits += 1
+            errors.append(distances[nearest])
+            found, true = pad.layout.lookup([blob.x, x], [blob.y, y], (source.height, source.width))
+            right_tiles += found == true
+        misses += len(tips)
+
+        if (pad.style, pad.toggle) != mode:
+            mode = (pad.style, pad.toggle)
+            modes.append(list(mode))
+    pad.stop()
+
+    timings = pad.timer.percentiles()
+    return {
+        # from the median frame, so a stray slow frame (the first one, another process) does not count
+        'fps': round(1. / max(float(np.median(steps)), 1e-9), 1),
+        'precision': round(hits / float(max(hits + false_positives, 1)), 4),
+        'recall': round(hits / float(max(hits + misses, 1)), 4),
+        'hit_rate': round(right_tiles / float(max(hits, 1)), 4),
+        'centre_error_px': round(float(np.mean(errors)) if errors else 0., 2),
+        'notes': events.chords,
+        'modes': modes,
+        'stages_p50_ms': {stage: row['p50'] for stage, row in timings.items() if stage != 'frame'},
+    }
+
+
+def check(name, result, baseline, expected_notes, expected_modes, fps_tolerance, accuracy_tolerance):
+    '''
+    Reasons the scenario failed, [] if it passed.
+    '''
+    failures = []
+    if expected_notes is not None and result['notes'] != expected_notes:
+        failures.append('{}: note-ons {} instead of {}'.format(name, result['notes'], expected_notes))
+    if expected_modes is not None and result['modes'] != expected_modes:
+        failures.append('{}: mode changes {} instead of {}'.format(name, result['modes'], expected_modes))
+    if baseline is None:
+        return failures
+    for key in ('precision', 'recall', 'hit_rate'):
+        if result[key] < baseline[key] - accuracy_tolerance:
+            failures.append('{}: {} fell from {} to {}'.format(name, key, baseline[key], result[key]))
+    if result['fps'] < baseline['fps'] * (1 - fps_tolerance):
+        failures.append('{}: {} fps, baseline {} fps'.format(name, result['fps'], baseline['fps']))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Regression check of the vision pipeline on synthetic ground truth')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--method', default='hsv', help='finger detection method')
+    parser.add_argument('--backend', default='contours', help='blob extraction backend')
+    parser.add_argument('--scale', type=float, default=1.0, help='detection scale')
+    parser.add_argument('--fps-tolerance', type=float, default=0.25, help='allowed frame rate drop (fraction)')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.01, help='allowed precision/recall drop')
+    parser.add_argument('--only', nargs='+', default=None, help='scenarios to run')
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    # the baseline is kept per detector configuration
+    config = '{}/{}/{}'.format(args.method, args.backend, args.scale)
+    baseline = baselines.get(config, {})
+
+    results = {}
+    failures = []
+    print('{:>12} {:>8} {:>10} {:>8} {:>9} {:>10}'.format('scenario', 'fps', 'precision', 'recall', 'hit rate',
+                                                           'error px'))
+    for name, (factory, notes, modes) in scenarios().items():
+        if args.only and name not in args.only:
+            continue
+        result = results[name] = run_scenario(factory, args.method, args.backend, args.scale)
+        print('{:>12} {:>8.1f} {:>10.4f} {:>8.4f} {:>9.4f} {:>10.2f}'.format(
+            name, result['fps'], result['precision'], result['recall'], result['hit_rate'],
+            result['centre_error_px']))
+        print('{:>12} {}'.format('', '  '.join('{} {:.3f}'.format(stage, ms)
+                                               for stage, ms in result['stages_p50_ms'].items())))
+        failures += check(name, result, None if args.update else baseline.get(name), notes, modes,
+                          args.fps_tolerance, args.accuracy_tolerance)
+
+    if args.update:
+        baseline.update({name: {key: result[key] for key in ('fps', 'precision', 'recall', 'hit_rate')}
+                         for name, result in results.items()})
+        baselines[config] = baseline
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('wrote {}'.format(args.baseline))
+    elif not baseline:
+        print('no baseline for {} in {}, run with --update to record one'.format(config, args.baseline))
+
+    for failure in failures:
+        print('REGRESSION ' + failure)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Checks that what the pad writes out of a replay is timed like the recording, not like the
+# replay: replays a scripted source (taps at known frames, 30 fps) as fast as it can into a
+# session log and a MIDI file, and checks the note-ons in both are at the times of their
+# frames. Exits with status 1 if they are not.
+# To run (from src/): python3 test/replay_timing_check.py
+
+## Import the relevant files
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from calibration import DEFAULT_CALIBRATION
+from event_output import MidiFileSink
+from pad import Pad
+from session import NoteRecord, SessionReader
+from sources import ScriptedSource
+
+# a tile of the 2x2 pad, and the frames a finger lands on it
+TILE = (162, 195)
+TAPS = (60, 150)
+FPS = 30
+
+
+def midi_note_ons(path):
+    '''
+    Seconds from the start of the first track of a MIDI file (as MidiFileSink writes them) of
+    every note-on in it.
+    '''
+    with open(path, 'rb') as f:
+        data = f.read()
+    pos = 14 + 8
+    tick = 0
+    ons = []
+    while pos < len(data):
+        delta = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            delta = (delta << 7) | (byte & 0x7f)
+            if byte < 0x80:
+                break
+        tick += delta
+        status = data[pos]
+        if status == 0xff:
+            # meta event: type, length (under 128 here), data; end of track stops
+            if data[pos + 1] == 0x2f:
+                break
+            pos += 3 + data[pos + 2]
+        elif status & 0xf0 == 0xc0:
+            pos += 2
+        else:
+            if status & 0xf0 == 0x90:
+                ons.append(tick / float(MidiFileSink.TICKS_PER_SECOND))
+            pos += 3
+    return ons
+
+
+def check(name, stamps, expected, tolerance):
+    print('{} note-ons at {} s, expected {} s'.format(
+        name, ', '.join('{:.3f}'.format(stamp) for stamp in stamps), ', '.join('{:.3f}'.format(t) for t in expected)))
+    if len(stamps) != len(expected) or any(abs(stamp - t) > tolerance for stamp, t in zip(stamps, expected)):
+        print('FAIL: the {} is not timed like the recording'.format(name))
+        return False
+    return True
+
+
+def main():
+    source = ScriptedSource([(start, start + 6, TILE, TILE, 45) for start in TAPS], frames=TAPS[-1] + 20, fps=FPS)
+    expected = [start / float(FPS) for start in TAPS]
+
+    workdir = tempfile.mkdtemp()
+    try:
+        log = os.path.join(workdir, 'replay.mtp')
+        midi = os.path.join(workdir, 'replay.mid')
+        output = MidiFileSink(midi)
+        pad = Pad(source, name='replay', profile=DEFAULT_CALIBRATION, record=log, output=output,
+                  clock=source.clock).start()
+        while pad.step():
+            pass
+        pad.stop()
+        output.close()
+        stamps = [record.stamp for record in SessionReader(log).records()
+                  if isinstance(record, NoteRecord) and record.kind == 'on']
+        ons = midi_note_ons(midi)
+    finally:
+        shutil.rmtree(workdir)
+
+    # (MIDI times are whole ticks)
+    passed = check('session log', stamps, expected, 1e-6)
+    passed = check('MIDI file', ons, expected, 1. / MidiFileSink.TICKS_PER_SECOND) and passed
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
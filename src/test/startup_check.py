@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Checks that every module imports without side effects (no threads started, no files
+# written, no camera, window or sound output opened), then starts the pad a few times on a
+# generated source, without a display or sound card, and reports how long it took to the
+# first frame and to the first sound. Exits with status 1 if an import did anything.
+# To run (from src/): python3 test/startup_check.py [--runs 5]
+
+## Import the relevant files
+import argparse
+import glob
+import importlib
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# (third party modules are imported up front, so anything they start is not blamed on the pad)
+import cv2
+import numpy as np
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, SRC)
+
+
+def check_imports(workdir):
+    '''
+    Import every module of the pad from workdir. Returns (module, import seconds) pairs and the
+    side effects seen.
+    '''
+    modules = sorted(os.path.splitext(os.path.basename(path))[0] for path in glob.glob(os.path.join(SRC, '*.py')))
+    threads = set(threading.enumerate())
+    times = []
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        for module in modules:
+            started = time.perf_counter()
+            importlib.import_module(module)
+            times.append((module, time.perf_counter() - started))
+    finally:
+        os.chdir(cwd)
+
+    effects = ['started thread {}'.format(thread.name) for thread in set(threading.enumerate()) - threads]
+    effects += ['wrote {}'.format(name) for name in os.listdir(workdir)]
+    return times, effects
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check for import side effects and time the pad startup')
+    parser.add_argument('--runs', type=int, default=5, help='startups to time')
+    parser.add_argument('--frames', type=int, default=60, help='frames each startup runs for')
+    parser.add_argument('--source', default='synthetic:3')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    try:
+        times, effects = check_imports(workdir)
+        slowest = sorted(times, key=lambda item: -item[1])[:3]
+        print('imported {} modules, slowest: {}'.format(
+            len(times), ', '.join('{} {:.1f} ms'.format(module, seconds * 1000) for module, seconds in slowest)))
+        for effect in effects:
+            print('SIDE EFFECT ' + effect)
+
+        from audio import AudioEngine, NullSink
+        from instrumentation import StartupTimer
+        from multitouch_pad import scan
+
+        # only the startup lines
+        logging.basicConfig(level=logging.WARNING)
+        milestones = {}
+        for run in range(args.runs):
+            startup = StartupTimer()
+            scan(args.source, audio=AudioEngine(NullSink()), headless=True, max_frames=args.frames,
+                 timings=os.path.join(workdir, 'timings.json'), startup=startup)
+            for milestone, seconds in startup.marks.items():
+                milestones.setdefault(milestone, []).append(seconds)
+    finally:
+        shutil.rmtree(workdir)
+
+    print('{:>12} {:>9} {:>9}   over {} startups'.format('milestone', 'p50 ms', 'max ms', args.runs))
+    for milestone, seconds in sorted(milestones.items(), key=lambda item: np.median(item[1])):
+        print('{:>12} {:>9.1f} {:>9.1f}'.format(milestone, np.median(seconds) * 1000, max(seconds) * 1000))
+    return 1 if effects else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
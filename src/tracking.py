@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+## Import the relevant files
+from collections import deque
+
+import numpy as np
+
+
+class Track(object):
+    '''
+    One touch followed across frames: a persistent id, a bounded history of (time, x, y)
+    and its current velocity in pixels per second.
+    '''
+    __slots__ = ('id', 'history', 'velocity', 'frames', 'missed', 'gesture')
+
+    def __init__(self, track_id, x, y, now, history):
+        self.id = track_id
+        self.history = deque([(now, x, y)], maxlen=history)
+        self.velocity = (0.0, 0.0)
+        self.frames = 1         # frames this touch has been seen in
+        self.missed = 0         # frames in a row it has not been seen in
+        self.gesture = {}       # per-touch state of the gesture recognizer
+
+    @property
+    def position(self):
+        return self.history[-1][1:]
+
+    @property
+    def start(self):
+        return self.history[0][1:]
+
+    def predict(self, now):
+        # where the touch should be now if it kept its velocity
+        t, x, y = self.history[-1]
+        return x + self.velocity[0] * (now - t), y + self.velocity[1] * (now - t)
+
+    def move(self, x, y, now):
+        t, px, py = self.history[-1]
+        if now > t:
+            self.velocity = ((x - px) / (now - t), (y - py) / (now - t))
+        self.history.append((now, x, y))
+        self.frames += 1
+        self.missed = 0
+
+
+class TouchTracker(object):
+    '''
+    Associates the blob centres of consecutive frames into persistent touch tracks.
+
+    Every frame the predicted track positions are matched to the new centres nearest pair
+    first (greedy assignment over the track x centre distance matrix), ignoring pairs further
+    apart than max_distance. With at most ten fingers the whole matrix is a hundred entries,
+    cheaper than maintaining a spatial index. Unmatched centres start new tracks; a track
+    that goes unmatched survives max_missed frames (the mask dropping a finger for a frame
+    does not end the touch) before it is removed.
+    '''
+
+    def __init__(self, max_distance=80, max_missed=2, history=16):
+        self.max_distance = max_distance
+        self.max_missed = max_missed
+        self.history = history
+        self.tracks = []
+        self.next_id = 0
+
+    def update(self, points, now):
+        '''
+        Feed the (x, y) centres of this frame; returns the tracks seen in this frame.
+        '''
+        points = np.asarray(points, np.float64).reshape(-1, 2)
+        matched_tracks = set()
+        matched_points = set()
+
+        if self.tracks and len(points):
+            predicted = np.array([track.predict(now) for track in self.tracks])
+            distance = np.hypot(*(predicted[:, None, :] - points[None, :, :]).transpose(2, 0, 1))
+            for flat in np.argsort(distance, axis=None):
+                t, p = divmod(int(flat), len(points))
+                if distance[t, p] > self.max_distance:
+                    break
+                if t in matched_tracks or p in matched_points:
+                    continue
+                self.tracks[t].move(points[p, 0], points[p, 1], now)
+                matched_tracks.add(t)
+                matched_points.add(p)
+
+        # tracks that were not seen this frame
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+
+        # new touches
+        for p in range(len(points)):
+            if p not in matched_points:
+                self.tracks.append(Track(self.next_id, points[p, 0], points[p, 1], now, self.history))
+                self.next_id += 1
+
+        return self.active()
+
+    def active(self):
+        '''
+        Tracks seen in the latest frame.
+        '''
+        return [track for track in self.tracks if track.missed == 0]
+
+
+class GestureRecognizer(object):
+    '''
+    Swipe and two-finger hold gestures in the swipe area (y < top), computed from the touch
+    tracks in O(active touches) per frame.
+
+    swipe: a single touch in the swipe area stays on the half it started in for hold_frames
+    frames, then crosses to the other half. 'swipe_right' is left to right, 'swipe_left' the
+    other way.
+    toggle: exactly two touches in the swipe area, both held for hold_frames frames. Fires once
+    per hold; the fingers have to lift before the next toggle.
+    '''
+
+    def __init__(self, top, mid_x, hold_frames=10):
+        self.top = top
+        self.mid_x = mid_x
+        self.hold_frames = hold_frames
+        # ids of the touch pair that already toggled
+        self.toggled = None
+
+    def update(self, tracks):
+        '''
+        Feed this frame's tracks (all of TouchTracker.tracks, so a touch the mask drops for a
+        frame still counts); returns the gestures completed in this frame.
+        '''
+        gestures = []
+        swiping = [track for track in tracks if track.position[1] < self.top]
+
+        for track in swiping:
+            if track.missed:
+                continue
+            x = track.position[0]
+            side = 'left' if x <= self.mid_x else 'right'
+            state = track.gesture
+            if 'side' not in state:
+                # first frame in the swipe area: remember which half the swipe starts from
+                state['side'] = side
+                state['held'] = 0
+            if side == state['side']:
+                state['held'] += 1
+            elif state['held'] >= self.hold_frames and len(swiping) == 1 and not state.get('done'):
+                # crossed over after a long enough hold
+                gestures.append('swipe_right' if state['side'] == 'left' else 'swipe_left')
+                state['done'] = True
+
+        if len(swiping) == 2:
+            pair = tuple(sorted(track.id for track in swiping))
+            held = min(track.gesture.get('held', 0) for track in swiping)
+            if held >= self.hold_frames and pair != self.toggled:
+                gestures.append('toggle')
+                self.toggled = pair
+        else:
+            self.toggled = None
+
+        return gestures